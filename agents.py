@@ -0,0 +1,749 @@
+"""Agent prompts and the multi-agent RFP pipeline definition.
+
+This module has no Streamlit dependency so the same agents can be driven
+from the web app or from scripts. Agents receive an `llm` callable with the
+signature of call_anthropic_api(prompt, max_tokens, temperature, system_prompt).
+"""
+import functools
+import json
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache import hash_payload
+from llm_client import min_cacheable_tokens, text_block
+from pipeline import Node, Pipeline
+from prompts import CHARS_PER_TOKEN, budgeted, count_tokens, requirements_block
+from text_index import normalize_text, tokenize
+
+
+# Function to provide sample hard-coded RFP requirements
+def get_sample_rfp_requirements():
+    """Returns hard-coded sample RFP requirements for demo purposes"""
+    return {
+        "Key_Requirements_And_Deliverables": {
+            "IT_Services": [
+                "Implementation of a cloud-based Enterprise Resource Planning (ERP) system",
+                "Integration with existing legacy systems including financial management and HR platforms",
+                "Customized dashboard and reporting capabilities",
+                "Mobile application development for field staff operations",
+                "Data migration from existing systems"
+            ],
+            "Security_Requirements": [
+                "Implementation of ISO 27001 compliant security measures",
+                "Multi-factor authentication for all user access points",
+                "End-to-end encryption for all data transfers",
+                "Regular security audits and vulnerability assessments"
+            ],
+            "Training_and_Support": [
+                "Comprehensive training program for all staff levels",
+                "24/7 technical support for critical systems",
+                "Detailed system documentation and user manuals",
+                "Monthly system health checks and performance optimization"
+            ]
+        },
+        "Compliance_Needs": {
+            "Regulatory_Compliance": [
+                "Adherence to Australian Privacy Principles (APP)",
+                "Compliance with General Data Protection Regulation (GDPR) for international operations",
+                "Compliance with industry-specific regulations and standards",
+                "Regular compliance reporting"
+            ],
+            "Standards_Compliance": [
+                "ISO 9001:2015 Quality Management System",
+                "ISO/IEC 27001:2022 Information Security Management",
+                "WCAG 2.1 Level AA accessibility standards"
+            ]
+        },
+        "Deadlines": {
+            "Submission_Deadline": "June 15, 2025, 17:00 AEST",
+            "Project_Timeline": [
+                "System Design and Planning: July-August 2025",
+                "Development and Integration: September-December 2025",
+                "Testing and Quality Assurance: January-February 2026",
+                "Staff Training: March 2026",
+                "Go-Live: April 1, 2026"
+            ]
+        },
+        "Evaluation_Criteria": {
+            "Technical_Solution": "35% - Assessment of the proposed technical solution and its alignment with business needs",
+            "Experience_and_Expertise": "25% - Evaluation of vendor's previous experience and technical expertise",
+            "Implementation_Approach": "20% - Assessment of project methodology, timeline, and risk management",
+            "Cost": "15% - Overall cost effectiveness and value for money",
+            "Support_Services": "5% - Quality of proposed ongoing support and maintenance"
+        },
+        "Required_Sections_For_The_Response": [
+            "Executive Summary",
+            "Company Profile and Experience",
+            "Understanding of Requirements",
+            "Proposed Solution and Approach",
+            "Project Management Methodology",
+            "Implementation Timeline",
+            "Team Composition and Qualifications",
+            "Quality Assurance and Testing",
+            "Training and Knowledge Transfer",
+            "Ongoing Support and Maintenance",
+            "Pricing Structure",
+            "References and Case Studies"
+        ]
+    }
+
+
+# Requirement categories looked up independently by the Knowledge Retrieval Agent
+KNOWLEDGE_CATEGORIES = {
+    "knowledge_deliverables": ("Key_Requirements_And_Deliverables", "Evaluation_Criteria"),
+    "knowledge_compliance": ("Compliance_Needs", "Deadlines"),
+}
+
+# Maximum number of response sections drafted at the same time
+DRAFT_CONCURRENCY = int(os.getenv("RFP_DRAFT_CONCURRENCY", "4"))
+# Draft the first section alone so it writes the shared prompt cache the other sections then read
+WARM_PROMPT_CACHE = os.getenv("RFP_WARM_PROMPT_CACHE", "1") != "0"
+
+# Document Parser map-reduce settings: chunk size and overlap in (estimated) tokens
+PARSER_CHUNK_TOKENS = int(os.getenv("RFP_PARSER_CHUNK_TOKENS", "6000"))
+PARSER_CHUNK_OVERLAP = int(os.getenv("RFP_PARSER_CHUNK_OVERLAP", "200"))
+PARSER_CONCURRENCY = int(os.getenv("RFP_PARSER_CONCURRENCY", "4"))
+
+# Share of a removed requirement's words a previous section draft must contain to be redrafted
+CARRY_OVER_OVERLAP = float(os.getenv("RFP_CARRY_OVER_OVERLAP", "0.5"))
+
+# Top-level keys rendered by the Requirements tab, in display order
+REQUIREMENT_KEYS = [
+    "Key_Requirements_And_Deliverables",
+    "Compliance_Needs",
+    "Deadlines",
+    "Evaluation_Criteria",
+    "Required_Sections_For_The_Response",
+]
+
+REQUIREMENTS_SCHEMA = """{
+  "Key_Requirements_And_Deliverables": {"<Category_Name>": ["<requirement>", ...]},
+  "Compliance_Needs": {"<Category_Name>": ["<compliance requirement>", ...]},
+  "Deadlines": {"Submission_Deadline": "<date and time>", "Project_Timeline": ["<phase: dates>", ...]},
+  "Evaluation_Criteria": {"<Criterion_Name>": "<weighting% - description>"},
+  "Required_Sections_For_The_Response": ["<section title>", ...]
+}"""
+
+PARSER_SYSTEM_PROMPT = "You are a Document Parser Agent that extracts structured requirements from RFP documents. You reply with JSON only."
+
+KNOWLEDGE_SYSTEM_PROMPT = "You are a Knowledge Retrieval Agent for a professional services firm in Australia. You find relevant information from the company's knowledge base."
+RESPONSE_SYSTEM_PROMPT = "You are a Response Generator Agent for an Australian professional services firm. You create professional RFP response content."
+REVIEW_SYSTEM_PROMPT = "You are a Quality Control Agent that reviews RFP responses for completeness, compliance, and quality."
+
+
+def _anchor(text, separator, low, high):
+    """Position of the separator in text[low:high] whose preceding text hashes lowest, or -1"""
+    best, best_hash = -1, None
+    position = text.find(separator, low, high)
+    while position != -1:
+        value = zlib.crc32(text[max(0, position - 64):position].encode("utf-8"))
+        if best_hash is None or value < best_hash:
+            best, best_hash = position, value
+        position = text.find(separator, position + 1, high)
+    return best
+
+
+def chunk_text(text, max_tokens=None, overlap_tokens=None):
+    """Split text into chunks of at most max_tokens, breaking on paragraph or line boundaries.
+
+    Consecutive chunks share up to overlap_tokens of trailing text so a
+    requirement that straddles a boundary is seen whole by one chunk. Cut
+    points are chosen by the text around them rather than by position, so
+    an edit early in a document leaves the later chunks unchanged.
+    """
+    max_chars = (max_tokens or PARSER_CHUNK_TOKENS) * CHARS_PER_TOKEN
+    overlap_chars = (PARSER_CHUNK_OVERLAP if overlap_tokens is None else overlap_tokens) * CHARS_PER_TOKEN
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Prefer to cut at a paragraph break, then a line break, in the second half of the window
+            for separator in ("\n\n", "\n", ". "):
+                cut = _anchor(text, separator, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap_chars, start + 1)
+    return chunks
+
+
+def parse_json_object(text):
+    """Return the first JSON object embedded in an LLM reply, or None"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def run_chunk_parser(llm, chunk, index, total):
+    """Document Parser Agent (map step) - extracts partial requirements from one chunk"""
+    parser_prompt = f"""Extract the RFP requirements contained in this excerpt (part {index + 1} of {total}) of an RFP document.
+
+    Return a single JSON object using only the keys of this schema:
+    {REQUIREMENTS_SCHEMA}
+
+    Only include information stated in the excerpt. Omit keys with nothing to report.
+    Use underscores instead of spaces in category names.
+
+    RFP excerpt:
+    {chunk}
+    """
+    return llm(
+        parser_prompt,
+        max_tokens=2000,
+        temperature=0,
+        system_prompt=PARSER_SYSTEM_PROMPT
+    )
+
+
+def _normalize_item(value):
+    return re.sub(r"[\s\W_]+", " ", str(value)).strip().lower()
+
+
+def _merge_value(current, incoming):
+    if current is None:
+        return incoming
+    if isinstance(current, dict) and isinstance(incoming, dict):
+        for key, value in incoming.items():
+            current[key] = _merge_value(current.get(key), value)
+        return current
+    if isinstance(current, list) or isinstance(incoming, list):
+        merged = current if isinstance(current, list) else [current]
+        seen = {_normalize_item(item) for item in merged}
+        for item in incoming if isinstance(incoming, list) else [incoming]:
+            if _normalize_item(item) not in seen:
+                seen.add(_normalize_item(item))
+                merged.append(item)
+        return merged
+    # Conflicting scalars: keep the first one found
+    return current
+
+
+def merge_requirements(partials):
+    """Reduce step: merge partial requirement dicts, de-duplicating list items"""
+    merged = {}
+    for partial in partials:
+        for key, value in partial.items():
+            if key in REQUIREMENT_KEYS and value:
+                merged[key] = _merge_value(merged.get(key), value)
+    return {key: merged[key] for key in REQUIREMENT_KEYS if key in merged}
+
+
+def chunk_fingerprint(chunk):
+    """Hash of everything that goes into a chunk's parser prompt apart from its position"""
+    return hash_payload({"chunk": chunk, "schema": REQUIREMENTS_SCHEMA, "system": PARSER_SYSTEM_PROMPT})
+
+
+def run_document_parser(llm, rfp_text, max_concurrency=None, on_progress=None, memo=None):
+    """Document Parser Agent - map-reduce requirement extraction over the whole RFP.
+
+    The text is split into token-budgeted chunks, each chunk is parsed in
+    parallel, and the partial results are merged into the dict schema the
+    Requirements tab renders. Returns {"error", "raw_response"} when nothing
+    could be extracted. on_progress(done, total) is called as chunks finish.
+
+    With a memo, chunks parsed before (in this run, or in the earlier run
+    it was seeded from) reuse their stored reply, so an amended RFP only
+    sends its changed chunks to the model.
+    """
+    chunks = chunk_text(rfp_text or "")
+    if not chunks:
+        return {"error": "No text could be extracted from the RFP document."}
+
+    replies = [None] * len(chunks)
+    fingerprints = [chunk_fingerprint(chunk) for chunk in chunks]
+    done = 0
+
+    def finish(index, reply):
+        nonlocal done
+        replies[index] = reply
+        done += 1
+        if memo is not None:
+            memo.put("chunk:" + fingerprints[index], fingerprints[index], reply)
+        if on_progress is not None:
+            on_progress(done, len(chunks))
+
+    pending = []
+    for index, fingerprint in enumerate(fingerprints):
+        remembered = memo.get("chunk:" + fingerprint) if memo is not None else None
+        if remembered is not None and remembered[0] == fingerprint:
+            finish(index, remembered[1])
+        else:
+            pending.append(index)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency or PARSER_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(run_chunk_parser, llm, chunks[index], index, len(chunks)): index
+            for index in pending
+        }
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+
+    partials = [partial for partial in map(parse_json_object, replies) if partial]
+    requirements = merge_requirements(partials)
+    if not requirements:
+        return {
+            "error": "The Document Parser Agent could not extract structured requirements.",
+            "raw_response": "\n\n".join(replies)
+        }
+    return requirements
+
+
+def shared_context(requirements):
+    """The RFP context block shared by the response and review agents"""
+    return f"RFP Requirements:\n{requirements_block(requirements, 'shared')}"
+
+
+def shared_context_cacheable(requirements):
+    """Whether the shared context is long enough for the API to cache it"""
+    return count_tokens(shared_context(requirements)) >= min_cacheable_tokens()
+
+
+def shared_context_system(requirements, system_prompt):
+    """System blocks: the shared RFP context as a prompt-cache breakpoint, then the agent's role.
+
+    The context block is byte-identical for every agent that uses it, so the
+    Response Generator, each section call and Quality Control all read it
+    from the prompt cache after the first request writes it. Context below
+    the model's minimum cacheable length gets no breakpoint, since the API
+    would not cache it anyway.
+    """
+    context = shared_context(requirements)
+    return [text_block(context, cache=shared_context_cacheable(requirements)), text_block(system_prompt)]
+
+
+def run_knowledge_agent(llm, requirements):
+    """Knowledge Retrieval Agent - recommends experience to cite for the given requirements"""
+    knowledge_prompt = f"""Given these RFP requirements, provide relevant information that should be included in our response:
+
+    {requirements_block(requirements, "knowledge")}
+
+    Include:
+    1. Suggested past projects that demonstrate relevant experience
+    2. Key team members who should be mentioned
+    3. Standard service descriptions that match the requirements
+    4. Relevant compliance certifications and credentials
+
+    Format as a structured list of recommendations.
+    """
+    return llm(
+        knowledge_prompt,
+        max_tokens=2000,
+        temperature=0.2,
+        system_prompt=KNOWLEDGE_SYSTEM_PROMPT,
+        semantic_cache=True
+    )
+
+
+def run_grounded_knowledge_agent(llm, requirements, knowledge_base):
+    """Knowledge Retrieval Agent - summarises knowledge-base passages retrieved for the requirements.
+
+    Passages are found locally (see knowledge_base.retrieve_for_requirements);
+    the model only condenses and cites them. Without any matching passage no
+    call is made.
+    """
+    from knowledge_base import retrieve_for_requirements
+
+    passages = retrieve_for_requirements(knowledge_base, requirements)
+    if not passages:
+        return "_No matching material was found in the knowledge base for: " + ", ".join(
+            str(key).replace("_", " ") for key in requirements
+        ) + "._"
+    sources = budgeted(
+        "\n\n".join(f"[{number}] ({passage['title']}) {passage['text']}" for number, passage in enumerate(passages, 1)),
+        "knowledge",
+        "passages"
+    )
+    knowledge_prompt = f"""Summarise what these excerpts from our knowledge base say that is relevant to the RFP requirements below.
+
+    Requirements:
+    {requirements_block(requirements, "knowledge")}
+
+    Knowledge base excerpts:
+    {sources}
+
+    Use only facts stated in the excerpts and cite them as [1], [2], ...
+    Group the points by requirement and keep the summary under 300 words.
+    If the excerpts do not cover a requirement, say so in one line instead of inventing material.
+    """
+    return llm(
+        knowledge_prompt,
+        max_tokens=700,
+        temperature=0,
+        system_prompt=KNOWLEDGE_SYSTEM_PROMPT,
+        semantic_cache=True
+    )
+
+
+def merge_knowledge(parts):
+    """Join per-category knowledge lookups into one markdown document"""
+    return "\n\n".join(part for part in parts if part)
+
+
+def run_response_agent(llm, requirements, knowledge):
+    """Response Generator Agent - drafts the RFP response"""
+    response_prompt = f"""Create draft responses for the RFP based on its requirements and this available knowledge:
+
+    Available Knowledge:
+    {budgeted(knowledge, "response", "knowledge")}
+
+    Generate professional, compelling draft responses for key sections of the RFP.
+    Format each section with a clear heading and concise, value-focused content.
+    Use markdown formatting for better readability.
+    """
+    return llm(
+        response_prompt,
+        max_tokens=3500,
+        temperature=0.4,
+        system_prompt=shared_context_system(requirements, RESPONSE_SYSTEM_PROMPT)
+    )
+
+
+def run_section_agent(llm, requirements, knowledge, section, sections, on_text=None):
+    """Response Generator Agent - drafts a single required section.
+
+    With on_text, the llm is asked to stream: it is passed on_text, which it
+    calls with the text so far as the reply arrives.
+    """
+    section_prompt = f"""Write the "{section}" section of our RFP response based on the RFP requirements and this available knowledge:
+
+    Available Knowledge:
+    {budgeted(knowledge, "section", "knowledge")}
+
+    The full response contains these sections, in order: {", ".join(sections)}.
+    Write only the "{section}" section and avoid repeating content that belongs in the other sections.
+    Start with the heading "## {section}" and keep the content professional, compelling and value-focused.
+    Use markdown formatting for better readability.
+    """
+    streaming = {"on_text": on_text} if on_text is not None else {}
+    text = llm(
+        section_prompt,
+        max_tokens=1200,
+        temperature=0.4,
+        system_prompt=shared_context_system(requirements, RESPONSE_SYSTEM_PROMPT),
+        **streaming
+    ).strip()
+    if not text.startswith("#"):
+        text = f"## {section}\n\n{text}"
+    return text
+
+
+def section_fingerprint(requirements, knowledge, section, sections):
+    """Hash of everything that goes into a section's prompt"""
+    return hash_payload({
+        "section": section,
+        "sections": list(sections),
+        "requirements": requirements_block(requirements, "shared"),
+        "knowledge": budgeted(knowledge, "section", "knowledge"),
+        "system": RESPONSE_SYSTEM_PROMPT,
+    })
+
+
+def requirement_leaves(requirements):
+    """Normalised text of every individual requirement value, for comparing two sets of requirements"""
+    leaves = set()
+
+    def walk(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+        elif value not in (None, ""):
+            leaves.add(normalize_text(str(value)))
+
+    walk(requirements)
+    return leaves
+
+
+def section_affected(section, text, changed):
+    """Whether a previously drafted section covers any of the given (removed) requirements"""
+    words = set(tokenize(f"{section} {text}"))
+    for requirement in changed:
+        tokens = set(tokenize(requirement))
+        if tokens and len(tokens & words) / len(tokens) >= CARRY_OVER_OVERLAP:
+            return True
+    return False
+
+
+def requirement_groups(requirements):
+    """Map each requirement's normalised text to the words of its category path and of its sibling requirements"""
+    groups = {}
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(item, path + [str(key).replace("_", " ")])
+        elif isinstance(value, list):
+            texts = [normalize_text(str(item)) for item in value if not isinstance(item, (dict, list)) and item not in (None, "")]
+            for item in value:
+                if isinstance(item, (dict, list)):
+                    walk(item, path)
+            for text in texts:
+                groups[text] = (" ".join(path), " ".join(texts))
+        elif value not in (None, ""):
+            groups[normalize_text(str(value))] = (" ".join(path), "")
+
+    walk(requirements, [])
+    return groups
+
+
+def best_section(requirement, group, sections, texts):
+    """Index of the section a new requirement belongs in.
+
+    Sections are ranked by the words their title shares with the
+    requirement and its category path, then by the words their previous
+    draft (texts, by section) shares with the requirement, then with its
+    sibling requirements; group is (path, siblings) from requirement_groups().
+    """
+    tokens = set(tokenize(requirement))
+    path, siblings = set(tokenize(group[0])), set(tokenize(group[1]))
+
+    def score(index):
+        title = set(tokenize(sections[index]))
+        text = set(tokenize(texts.get(sections[index], "")))
+        return len((tokens | path) & title), len(tokens & text), len(siblings & text)
+
+    return max(range(len(sections)), key=score)
+
+
+def draft_sections(llm, requirements, knowledge, max_concurrency=None, on_section=None, on_progress=None,
+                   memo=None, regenerate=(), regenerate_llm=None, previous=None, on_section_text=None):
+    """Draft every required section in parallel and assemble them in section order.
+
+    At most max_concurrency sections are in flight at once; with
+    WARM_PROMPT_CACHE and a shared context long enough to be cached, the
+    first section is drafted before the rest are fanned out so they read
+    its cached prefix. on_section, if
+    given, is called from the calling thread as (index, section, text) each
+    time a section finishes, followed by on_progress(done, total).
+    on_section_text, if given, is called from the drafting threads as
+    (index, section, text so far) while a section streams in; the llms must
+    then accept on_text (see run_section_agent). Falls back to a single
+    Response Generator call when the requirements list no sections.
+
+    With a memo (see Pipeline.run_async), sections whose prompt inputs are
+    unchanged reuse their previous draft. Sections named in regenerate are
+    always drafted again, with regenerate_llm if given.
+
+    previous, if given, holds the "requirements" and drafted "sections" of
+    an earlier run of the same tender (see rfp_index). Its drafts are
+    carried over, except for sections that mention a requirement removed
+    since and the best-matching section (see best_section) for each
+    requirement added since, so an amendment only redrafts the sections it
+    touches.
+    """
+    sections = requirements.get("Required_Sections_For_The_Response") or []
+    if not sections:
+        return run_response_agent(llm, requirements, knowledge)
+
+    drafts = [None] * len(sections)
+    fingerprints = [section_fingerprint(requirements, knowledge, section, sections) for section in sections]
+    done = 0
+
+    def finish(index, text):
+        nonlocal done
+        drafts[index] = text
+        done += 1
+        if memo is not None:
+            memo.put("section:" + sections[index], fingerprints[index], text)
+        if on_section is not None:
+            on_section(index, sections[index], text)
+        if on_progress is not None:
+            on_progress(done, len(sections))
+
+    def draft(index):
+        section = sections[index]
+        section_llm = regenerate_llm if regenerate_llm is not None and section in regenerate else llm
+        on_text = None
+        if on_section_text is not None:
+            on_text = functools.partial(on_section_text, index, section)
+        return run_section_agent(section_llm, requirements, knowledge, section, sections, on_text=on_text)
+
+    pending = []
+    for index, section in enumerate(sections):
+        remembered = memo.get("section:" + section) if memo is not None and section not in regenerate else None
+        if remembered is not None and remembered[0] == fingerprints[index]:
+            finish(index, remembered[1])
+        else:
+            pending.append(index)
+
+    if previous is not None and pending:
+        groups, earlier = requirement_groups(requirements), requirement_leaves(previous["requirements"])
+        current = set(groups)
+        redraft = {
+            best_section(requirement, groups[requirement], sections, previous["sections"])
+            for requirement in current - earlier
+        }
+        carried = [
+            index for index in pending
+            if index not in redraft
+            and sections[index] not in regenerate
+            and sections[index] in previous["sections"]
+            and not section_affected(sections[index], previous["sections"][sections[index]], earlier - current)
+        ]
+        for index in carried:
+            finish(index, previous["sections"][sections[index]])
+        pending = [index for index in pending if index not in carried]
+
+    if WARM_PROMPT_CACHE and len(pending) > 1 and done == 0 and shared_context_cacheable(requirements):
+        finish(pending[0], draft(pending[0]))
+        pending = pending[1:]
+
+    with ThreadPoolExecutor(max_workers=max_concurrency or DRAFT_CONCURRENCY) as pool:
+        futures = {pool.submit(draft, index): index for index in pending}
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+    return "\n\n".join(drafts)
+
+
+def run_review_agent(llm, requirements, response_draft, approved_answers=()):
+    """Quality Control Agent - reviews the draft against the requirements.
+
+    requirements should be the same dict the sections were drafted from, so
+    the shared context block (and its prompt cache entry) is reused;
+    requirements answered from the approved-answer library are listed in
+    the prompt instead.
+    """
+    standard = ""
+    if approved_answers:
+        answered = "\n".join(f"    - {match['requirement']} (approved answer: {match['title']})" for match in approved_answers)
+        standard = f"""
+    Also required by the RFP, and answered with approved standard responses at the end of the draft:
+{answered}
+"""
+    review_prompt = f"""Review this draft RFP response against the RFP requirements and provide feedback:
+
+    Draft Response:
+    {budgeted(response_draft, "review", "response_draft")}
+{standard}
+    Provide feedback on:
+    1. Completeness - Are all requirements addressed?
+    2. Compliance - Does it meet all compliance needs?
+    3. Consistency - Is the response consistent throughout?
+    4. Areas for improvement
+    5. Sections requiring human expert review
+
+    Format your response in markdown with clear sections.
+    """
+    return llm(
+        review_prompt,
+        max_tokens=2000,
+        temperature=0,
+        system_prompt=shared_context_system(requirements, REVIEW_SYSTEM_PROMPT)
+    )
+
+
+def build_rfp_pipeline(llm, node_llms=None, draft_concurrency=None, on_section=None,
+                       memo=None, regenerate_sections=(), regenerate_llm=None, knowledge_base=None,
+                       answer_library=None, previous_run=None, on_section_text=None):
+    """Build the Document Parser -> Knowledge -> Response -> Review graph.
+
+    Knowledge lookups for the categories in KNOWLEDGE_CATEGORIES run
+    concurrently once requirements are available, and the response is
+    drafted one section at a time through draft_sections(). node_llms
+    optionally maps a node name to an llm callable used instead of the
+    default, e.g. a streaming variant for the "review" node. memo,
+    regenerate_sections and regenerate_llm are passed to draft_sections()
+    for per-section reuse; pass the same memo to Pipeline.run(). With a
+    knowledge_base the knowledge lookups summarise retrieved passages
+    instead of asking the model for suggestions. With an answer_library,
+    requirements that match an approved answer are answered from the
+    library and only the open ones go to the knowledge and response agents.
+    previous_run is passed to draft_sections() as previous, and
+    on_section_text as is to stream the sections in; the memo also serves
+    the Document Parser's per-chunk replies.
+    """
+    node_llms = node_llms or {}
+
+    def llm_for(name):
+        return node_llms.get(name, llm)
+
+    nodes = [Node(
+        "requirements",
+        lambda rfp_text, progress: run_document_parser(llm_for("requirements"), rfp_text, on_progress=progress, memo=memo),
+        inputs=("rfp_text",)
+    )]
+
+    # Requirements the knowledge and response agents work on
+    open_input = "requirements"
+    if answer_library is not None:
+        from answer_library import split_requirements
+
+        def match_answers(requirements):
+            matches, open_requirements = split_requirements(answer_library, requirements)
+            return {"approved_answers": matches, "open_requirements": open_requirements}
+        nodes.append(Node(
+            "approved_answers", match_answers, inputs=("requirements",),
+            outputs=("approved_answers", "open_requirements"),
+            # Matches are recomputed whenever the library changes
+            version=f"lib-{answer_library.version}"
+        ))
+        open_input = "open_requirements"
+
+    for name, categories in KNOWLEDGE_CATEGORIES.items():
+        # Each lookup reads only its own categories, so its memo survives edits to the others
+        subset_name = f"{name}_requirements"
+
+        def select(_categories=categories, **inputs):
+            requirements = inputs[open_input]
+            return {key: requirements[key] for key in _categories if key in requirements}
+        nodes.append(Node(subset_name, select, inputs=(open_input,)))
+
+        def lookup(_name=name, _subset_name=subset_name, **inputs):
+            subset = inputs[_subset_name]
+            if not subset:
+                return ""
+            if knowledge_base is not None:
+                return run_grounded_knowledge_agent(llm_for(_name), subset, knowledge_base)
+            return run_knowledge_agent(llm_for(_name), subset)
+        # Lookups are recomputed whenever the indexed documents change
+        version = f"kb-{knowledge_base.version}" if knowledge_base is not None else "1"
+        nodes.append(Node(name, lookup, inputs=(subset_name,), version=version))
+
+    nodes.append(Node(
+        "knowledge",
+        lambda **parts: merge_knowledge(parts[name] for name in KNOWLEDGE_CATEGORIES),
+        inputs=tuple(KNOWLEDGE_CATEGORIES)
+    ))
+
+    def respond(knowledge, progress, approved_answers=(), **inputs):
+        draft = draft_sections(
+            llm_for("response_draft"), inputs[open_input], knowledge,
+            max_concurrency=draft_concurrency, on_section=on_section, on_progress=progress,
+            memo=memo, regenerate=regenerate_sections, regenerate_llm=regenerate_llm, previous=previous_run,
+            on_section_text=on_section_text
+        )
+        if approved_answers:
+            from answer_library import approved_answers_section
+            draft = f"{draft}\n\n{approved_answers_section(approved_answers)}"
+        return draft
+    response_inputs = (open_input, "knowledge")
+    if answer_library is not None:
+        response_inputs += ("approved_answers",)
+    nodes.append(Node("response_draft", respond, inputs=response_inputs))
+    # The review shares the sections' context block; matched requirements go in its prompt
+    review_inputs = (open_input, "response_draft")
+    if answer_library is not None:
+        review_inputs += ("approved_answers",)
+    nodes.append(Node(
+        "review",
+        lambda response_draft, approved_answers=(), **inputs: run_review_agent(
+            llm_for("review"), inputs[open_input], response_draft, approved_answers
+        ),
+        inputs=review_inputs
+    ))
+    return Pipeline(nodes)
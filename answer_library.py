@@ -0,0 +1,219 @@
+"""Library of approved answers to requirements that recur in every tender.
+
+Each entry has a title, one or more phrasings of the requirement it answers
+and the approved markdown answer. Phrasings are indexed by MinHash over
+character 4-grams with an LSH band index, so an incoming requirement is
+matched in well under a millisecond. Matches at or above
+ANSWER_MATCH_THRESHOLD (exact Jaccard similarity of the shingle sets) that
+also state the same numbers, versions, levels and codes (see
+text_index.literals; "WCAG 2.2" never matches a "WCAG 2.1" answer) are
+inserted into the draft verbatim, and only the remaining requirements are
+sent to the Response Generator.
+
+The library is a JSON file that can be edited by hand or through the CLI:
+
+    python answer_library.py add --title "Information security" \
+        --requirement "ISO 27001 compliant security measures" --answer-file iso27001.md
+    python answer_library.py match "Implementation of ISO 27001 compliant security measures"
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import uuid
+
+from cache import DATA_DIR
+from text_index import LSHIndex, MinHasher, jaccard, literals, shingles
+
+ANSWER_LIBRARY_PATH = os.getenv("RFP_ANSWER_LIBRARY", os.path.join(DATA_DIR, "answer_library.json"))
+ANSWER_MATCH_THRESHOLD = float(os.getenv("RFP_ANSWER_MATCH_THRESHOLD", "0.6"))
+
+# Requirement categories that can be answered from the library
+ANSWERABLE_CATEGORIES = ("Key_Requirements_And_Deliverables", "Compliance_Needs")
+
+NUM_PERM = 64
+LSH_BANDS = 32  # 2 rows per band: candidates from a Jaccard similarity of about 0.2
+
+
+class AnswerLibrary:
+    """Approved answers indexed for fuzzy lookup by requirement text.
+
+    The JSON file is reloaded when it changes on disk.
+    """
+
+    def __init__(self, path, threshold=None):
+        self.path = path
+        self.threshold = ANSWER_MATCH_THRESHOLD if threshold is None else threshold
+        self._hasher = MinHasher(NUM_PERM)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entries = []
+        self._phrasings = []  # (entry index, shingle set, literal set)
+        self._index = LSHIndex(NUM_PERM, LSH_BANDS)
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        entries = []
+        if mtime is not None:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        phrasings, index = [], LSHIndex(NUM_PERM, LSH_BANDS)
+        for entry_index, entry in enumerate(entries):
+            for requirement in entry["requirements"]:
+                shingle_set = shingles(requirement)
+                index.add(len(phrasings), self._hasher.signature(shingle_set))
+                phrasings.append((entry_index, shingle_set, frozenset(literals(requirement))))
+        with self._lock:
+            self._entries, self._phrasings, self._index, self._mtime = entries, phrasings, index, mtime
+
+    @property
+    def version(self):
+        """Changes whenever the library file changes"""
+        self._refresh()
+        return str(self._mtime or "empty")
+
+    def entries(self):
+        self._refresh()
+        return list(self._entries)
+
+    def add(self, title, requirements, answer):
+        """Append an approved answer and return its id"""
+        self._refresh()
+        entry = {"id": uuid.uuid4().hex[:12], "title": title, "requirements": list(requirements), "answer": answer}
+        entries = self._entries + [entry]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+        self._refresh()
+        return entry["id"]
+
+    def match(self, requirement):
+        """Best approved answer for a requirement as (entry, score), or None below the threshold.
+
+        Phrasings whose numbers, versions or codes differ from the
+        requirement's never match, however similar the rest of the text.
+        """
+        self._refresh()
+        with self._lock:
+            entries, phrasings, index = self._entries, self._phrasings, self._index
+        if not entries:
+            return None
+        shingle_set, literal_set = shingles(requirement), frozenset(literals(requirement))
+        best = None
+        for candidate in index.query(self._hasher.signature(shingle_set)):
+            entry_index, phrasing, phrasing_literals = phrasings[candidate]
+            if phrasing_literals != literal_set:
+                continue
+            score = jaccard(shingle_set, phrasing)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (entries[entry_index], score)
+        return best
+
+
+def split_requirements(library, requirements):
+    """Separate requirements that have an approved answer from those that don't.
+
+    Returns (matches, open_requirements): matches is a list of dicts with
+    category, requirement, answer id, title, answer and score; open_requirements
+    is a copy of requirements without the matched items (and without
+    categories or groups left empty).
+    """
+    matches = []
+
+    def prune(value, category):
+        if isinstance(value, dict):
+            kept = {key: prune(item, category) for key, item in value.items()}
+            return {key: item for key, item in kept.items() if item not in (None, {}, [])}
+        if isinstance(value, list):
+            kept = [prune(item, category) for item in value]
+            return [item for item in kept if item not in (None, {}, [])]
+        if isinstance(value, str):
+            found = library.match(value)
+            if found is not None:
+                entry, score = found
+                matches.append({
+                    "category": category, "requirement": value, "answer_id": entry["id"],
+                    "title": entry["title"], "answer": entry["answer"], "score": round(score, 3),
+                })
+                return None
+        return value
+
+    open_requirements = {}
+    for category, value in (requirements or {}).items():
+        if category in ANSWERABLE_CATEGORIES:
+            value = prune(value, category)
+            if value in (None, {}, []):
+                continue
+        open_requirements[category] = value
+    return matches, open_requirements
+
+
+def approved_answers_section(matches):
+    """Markdown section with each matched approved answer once, listing the requirements it covers"""
+    if not matches:
+        return ""
+    grouped = {}
+    for match in matches:
+        grouped.setdefault(match["answer_id"], {"match": match, "requirements": []})["requirements"].append(match["requirement"])
+    parts = ["## Responses to Standard Requirements"]
+    for group in grouped.values():
+        parts.append(f"### {group['match']['title']}")
+        parts.append("**Addresses:** " + "; ".join(group["requirements"]))
+        parts.append(group["match"]["answer"].strip())
+    return "\n\n".join(parts)
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_answer_library():
+    """Return the process-wide answer library"""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = AnswerLibrary(ANSWER_LIBRARY_PATH)
+    return _library
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the approved-answer library")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="add an approved answer")
+    add.add_argument("--title", required=True)
+    add.add_argument("--requirement", action="append", required=True, help="a phrasing of the requirement; repeatable")
+    add.add_argument("--answer-file", required=True, help="markdown file with the approved answer")
+    match = commands.add_parser("match", help="show the approved answer for a requirement")
+    match.add_argument("requirement")
+    commands.add_parser("list", help="list approved answers")
+    args = parser.parse_args(argv)
+
+    library = get_answer_library()
+    if args.command == "add":
+        with open(args.answer_file, encoding="utf-8") as f:
+            print(library.add(args.title, args.requirement, f.read()))
+    elif args.command == "match":
+        found = library.match(args.requirement)
+        if found is None:
+            print("No approved answer above the threshold", file=sys.stderr)
+            return 1
+        entry, score = found
+        print(f"[{score:.2f}] {entry['title']}\n\n{entry['answer']}")
+    else:
+        for entry in library.entries():
+            print(f"{entry['id']}  {entry['title']}  ({len(entry['requirements'])} phrasings)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
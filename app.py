@@ -1,248 +1,27 @@
 import streamlit as st
-import requests
 import io
 import os
+import threading
 import time
-from PyPDF2 import PdfReader
-import tempfile
 from dotenv import load_dotenv
 import json
 import pandas as pd
 import re
+import uuid
+
+import jobs
+import llm_client
+from agents import KNOWLEDGE_CATEGORIES, build_rfp_pipeline
+import exports
+from answer_library import get_answer_library
+from knowledge_base import SUPPORTED_EXTENSIONS, get_knowledge_base
+from rfp_index import get_rfp_index, previous_outputs, seed_from_previous
+from pdf_extract import extract_pages_cached, join_pages, pdf_digest
+from run_store import RunMemo, get_store as get_run_store
 
 # Load environment variables from .env file
 load_dotenv()
 
-def generate_pdf(response_draft, review):
-    """Generate a PDF document from the RFP response and review"""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from io import BytesIO
-    
-    # Create a BytesIO buffer to receive the PDF data
-    buffer = BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=12
-    )
-    
-    heading2_style = ParagraphStyle(
-        'Heading2',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=10
-    )
-    
-    normal_style = ParagraphStyle(
-        'Normal',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=8
-    )
-    
-    # Build the document content
-    content = []
-    
-    # Add title
-    content.append(Paragraph("RFP Response Draft", title_style))
-    content.append(Spacer(1, 12))
-    
-    # Basic markdown to PDF conversion (simplified)
-    lines = response_draft.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            content.append(Paragraph(line[2:], title_style))
-        elif line.startswith('## '):
-            content.append(Paragraph(line[3:], heading2_style))
-        elif line.startswith('### '):
-            content.append(Paragraph(line[4:], heading2_style))
-        elif line.startswith('- ') or line.startswith('* '):
-            content.append(Paragraph(f"• {line[2:]}", normal_style))
-        else:
-            content.append(Paragraph(line, normal_style))
-    
-    # Add review section
-    content.append(Spacer(1, 20))
-    content.append(Paragraph("Quality Review", title_style))
-    content.append(Spacer(1, 12))
-    
-    # Add review content
-    lines = review.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            content.append(Paragraph(line[2:], title_style))
-        elif line.startswith('## '):
-            content.append(Paragraph(line[3:], heading2_style))
-        elif line.startswith('### '):
-            content.append(Paragraph(line[4:], heading2_style))
-        elif line.startswith('- ') or line.startswith('* '):
-            content.append(Paragraph(f"• {line[2:]}", normal_style))
-        else:
-            content.append(Paragraph(line, normal_style))
-    
-    # Build the PDF
-    doc.build(content)
-    buffer.seek(0)
-    return buffer
-
-def generate_docx(response_draft, review):
-    """Generate a Word document from the RFP response and review"""
-    from docx import Document
-    from docx.shared import Pt, RGBColor
-    from io import BytesIO
-    
-    # Create a new Document
-    doc = Document()
-    
-    # Add a title
-    title = doc.add_heading("RFP Response Draft", level=1)
-    title_format = title.runs[0].font
-    title_format.size = Pt(18)
-    
-    # Process the response draft content
-    lines = response_draft.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            heading = doc.add_heading(line[2:], level=1)
-        elif line.startswith('## '):
-            heading = doc.add_heading(line[3:], level=2)
-        elif line.startswith('### '):
-            heading = doc.add_heading(line[4:], level=3)
-        elif line.startswith('- ') or line.startswith('* '):
-            p = doc.add_paragraph()
-            p.add_run("• " + line[2:])
-            p.style = 'List Bullet'
-        else:
-            p = doc.add_paragraph(line)
-    
-    # Add a page break before the review section
-    doc.add_page_break()
-    
-    # Add the review section title
-    review_title = doc.add_heading("Quality Review", level=1)
-    
-    # Process the review content
-    lines = review.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            heading = doc.add_heading(line[2:], level=1)
-        elif line.startswith('## '):
-            heading = doc.add_heading(line[3:], level=2)
-        elif line.startswith('### '):
-            heading = doc.add_heading(line[4:], level=3)
-        elif line.startswith('- ') or line.startswith('* '):
-            p = doc.add_paragraph()
-            p.add_run("• " + line[2:])
-            p.style = 'List Bullet'
-        else:
-            p = doc.add_paragraph(line)
-    
-    # Save the document to a BytesIO buffer
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-# Function to provide sample hard-coded RFP requirements
-def get_sample_rfp_requirements():
-    """Returns hard-coded sample RFP requirements for demo purposes"""
-    return {
-        "Key_Requirements_And_Deliverables": {
-            "IT_Services": [
-                "Implementation of a cloud-based Enterprise Resource Planning (ERP) system",
-                "Integration with existing legacy systems including financial management and HR platforms",
-                "Customized dashboard and reporting capabilities",
-                "Mobile application development for field staff operations",
-                "Data migration from existing systems"
-            ],
-            "Security_Requirements": [
-                "Implementation of ISO 27001 compliant security measures",
-                "Multi-factor authentication for all user access points",
-                "End-to-end encryption for all data transfers",
-                "Regular security audits and vulnerability assessments"
-            ],
-            "Training_and_Support": [
-                "Comprehensive training program for all staff levels",
-                "24/7 technical support for critical systems",
-                "Detailed system documentation and user manuals",
-                "Monthly system health checks and performance optimization"
-            ]
-        },
-        "Compliance_Needs": {
-            "Regulatory_Compliance": [
-                "Adherence to Australian Privacy Principles (APP)",
-                "Compliance with General Data Protection Regulation (GDPR) for international operations",
-                "Compliance with industry-specific regulations and standards",
-                "Regular compliance reporting"
-            ],
-            "Standards_Compliance": [
-                "ISO 9001:2015 Quality Management System",
-                "ISO/IEC 27001:2022 Information Security Management",
-                "WCAG 2.1 Level AA accessibility standards"
-            ]
-        },
-        "Deadlines": {
-            "Submission_Deadline": "June 15, 2025, 17:00 AEST",
-            "Project_Timeline": [
-                "System Design and Planning: July-August 2025",
-                "Development and Integration: September-December 2025",
-                "Testing and Quality Assurance: January-February 2026",
-                "Staff Training: March 2026",
-                "Go-Live: April 1, 2026"
-            ]
-        },
-        "Evaluation_Criteria": {
-            "Technical_Solution": "35% - Assessment of the proposed technical solution and its alignment with business needs",
-            "Experience_and_Expertise": "25% - Evaluation of vendor's previous experience and technical expertise",
-            "Implementation_Approach": "20% - Assessment of project methodology, timeline, and risk management",
-            "Cost": "15% - Overall cost effectiveness and value for money",
-            "Support_Services": "5% - Quality of proposed ongoing support and maintenance"
-        },
-        "Required_Sections_For_The_Response": [
-            "Executive Summary",
-            "Company Profile and Experience",
-            "Understanding of Requirements",
-            "Proposed Solution and Approach",
-            "Project Management Methodology",
-            "Implementation Timeline",
-            "Team Composition and Qualifications",
-            "Quality Assurance and Testing",
-            "Training and Knowledge Transfer",
-            "Ongoing Support and Maintenance",
-            "Pricing Structure",
-            "References and Case Studies"
-        ]
-    }
-
 # Password protection
 def check_password():
     """Returns `True` if the user had the correct password."""
@@ -315,39 +94,127 @@ def get_api_key():
 # Initialize API key
 api_key = get_api_key()
 
-# Updated Anthropic API function for Claude 3 models using Messages API
-def call_anthropic_api(prompt, max_tokens=2000, temperature=0, system_prompt=None):
-    headers = {
-        "x-api-key": api_key,
-        "content-type": "application/json",
-        "anthropic-version": "2023-06-01"
-    }
-    
-    messages = [{"role": "user", "content": prompt}]
-    
-    data = {
-        "model": "claude-3-haiku-20240307",  # Using Claude 3 Haiku which is fast and reliable
-        "max_tokens": max_tokens,
-        "temperature": temperature,
-        "messages": messages
-    }
-    
-    # Add system prompt if provided
-    if system_prompt:
-        data["system"] = system_prompt
-    
-    response = requests.post(
-        "https://api.anthropic.com/v1/messages", 
-        headers=headers,
-        json=data
+# Anthropic Messages API call, sent over the shared pooled session in llm_client
+# prompt and system_prompt may be strings or lists of content blocks with cache_control breakpoints
+# client_id identifies the browser session so the rate limiter can queue users fairly
+# use_cache=False skips the response cache, e.g. when the user asks for a fresh draft
+# semantic_cache=True also serves near-identical earlier prompts (knowledge lookups only)
+def call_anthropic_api(prompt, max_tokens=2000, temperature=0, system_prompt=None, usage=None, client_id="default", use_cache=True, semantic_cache=False):
+    return llm_client.create_message(
+        api_key,
+        prompt,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        system_prompt=system_prompt,
+        use_cache=use_cache,
+        usage=usage,
+        client_id=client_id,
+        semantic_cache=semantic_cache
     )
-    
-    if response.status_code != 200:
-        raise Exception(f"Error from Anthropic API: {response.text}")
-    
-    # Extract the response text from the messages API format
-    response_json = response.json()
-    return response_json["content"][0]["text"]
+
+# Background jobs that run the multi-agent pipeline off the script thread (shared by all sessions)
+job_runner = jobs.get_runner()
+
+# Persistent per-run storage of the RFP text and every stage output
+run_store = get_run_store()
+
+# Past proposals, CVs and case studies the Knowledge Retrieval Agent searches
+knowledge_base = get_knowledge_base()
+
+# Approved answers to recurring requirements, inserted into drafts without an LLM call
+answer_library = get_answer_library()
+
+# Page text of every processed RFP, for recognising re-issued and amended tenders
+rfp_index = get_rfp_index()
+
+def run_rfp_job(job, run_id, client_id, force=(), regenerate_sections=()):
+    """Run the multi-agent pipeline for a stored run inside a background job.
+
+    Runs on a job worker thread, so it must not call Streamlit; progress and
+    partial output are published on the job for the UI to poll, and each
+    stage output is saved to the run store as soon as it is produced.
+
+    Stage outputs are memoized per run by an input fingerprint, so a re-run
+    only recomputes the stages (and sections) downstream of what changed.
+    Stages in force and sections in regenerate_sections are recomputed
+    regardless, bypassing the response cache. A run seeded from an earlier
+    version of the tender also carries over that run's unaffected sections.
+    """
+    context = {"rfp_text": run_store.get(run_id, "rfp_text")}
+    # Requirements edited by the user replace the Document Parser's output
+    if run_store.get(run_id, "requirements_edited", False):
+        context["requirements"] = run_store.get(run_id, "requirements")
+    force = set(force)
+    if regenerate_sections:
+        force.add("response_draft")
+    run_usage = llm_client.UsageTracker()
+    drafted_sections = {}
+    drafted_lock = threading.Lock()
+    reused_stages = []
+
+    # Called with each finished section and, as they stream in, with sections in progress
+    def on_section_drafted(index, section, text):
+        with drafted_lock:
+            drafted_sections[index] = text
+            job.set_partial("response_draft", "\n\n".join(drafted_sections[i] for i in sorted(drafted_sections)))
+
+    def streamed(prompt, on_text, use_cache=True, **kwargs):
+        chunks = []
+        stream = llm_client.stream_message(
+            api_key, prompt, use_cache=use_cache, usage=run_usage, client_id=client_id, **kwargs
+        )
+        for chunk in stream:
+            chunks.append(chunk)
+            on_text("".join(chunks))
+        return "".join(chunks)
+
+    def stream_review(prompt, **kwargs):
+        return streamed(prompt, lambda text: job.set_partial("review", text), use_cache="review" not in force, **kwargs)
+
+    def on_pipeline_event(event):
+        if event["event"] == "start":
+            job.set_progress(event["node"], 0.0)
+        elif event["event"] == "progress":
+            job.set_progress(event["node"], min(event["percent"] / 100, 0.99))
+        elif event["event"] == "end":
+            for key, value in event["outputs"].items():
+                run_store.put(run_id, key, value)
+            if event["cached"]:
+                reused_stages.append(event["node"])
+            job.set_progress(event["node"], 1.0)
+
+    # Section drafts pass on_text to stream in
+    def llm(prompt, on_text=None, **kwargs):
+        if on_text is not None:
+            return streamed(prompt, on_text, **kwargs)
+        return call_anthropic_api(prompt, usage=run_usage, client_id=client_id, **kwargs)
+
+    def fresh_llm(prompt, **kwargs):
+        return llm(prompt, use_cache=False, **kwargs)
+
+    node_llms = {name: fresh_llm for name in force}
+    node_llms["review"] = stream_review
+    for key in context:
+        job.set_progress(key, 1.0)
+
+    memo = RunMemo(run_store, run_id)
+    rfp_pipeline = build_rfp_pipeline(
+        llm,
+        node_llms=node_llms,
+        on_section=on_section_drafted,
+        on_section_text=on_section_drafted,
+        memo=memo,
+        regenerate_sections=regenerate_sections,
+        regenerate_llm=fresh_llm,
+        knowledge_base=knowledge_base,
+        answer_library=answer_library,
+        previous_run=previous_outputs(run_store, run_id)
+    )
+    _, timings = rfp_pipeline.run(context, on_event=on_pipeline_event, memo=memo, force=force)
+    run_store.put(run_id, "stage_timings", timings)
+    run_store.put(run_id, "reused_stages", reused_stages)
+    run_store.put(run_id, "token_usage", run_usage.snapshot())
+    return {"run_id": run_id}
 
 # Enhanced CSS with animations
 st.markdown("""
@@ -596,24 +463,6 @@ st.markdown("""
         margin-bottom: 1rem;
     }
     
-    /* Progress Animation */
-    @keyframes progress {
-        0% { width: 0%; }
-        100% { width: 100%; }
-    }
-    .animated-progress {
-        height: 4px;
-        background: #e5e7eb;
-        border-radius: 4px;
-        margin: 1rem 0;
-        overflow: hidden;
-    }
-    .animated-progress-bar {
-        height: 100%;
-        background: linear-gradient(90deg, #4f46e5, #7c3aed);
-        animation: progress 30s ease forwards;
-    }
-    
     /* Success Animation */
     @keyframes checkmark {
         0% {
@@ -1111,26 +960,78 @@ with st.sidebar:
         <div class="copyright">© 2025 Your Company Name</div>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Completed runs can be reopened instantly from the run store
+    recent_runs = run_store.recent_runs(limit=5, with_stage="review")
+    if recent_runs:
+        with st.expander("📂 Recent RFP runs"):
+            for run in recent_runs:
+                opened = time.strftime("%d %b %H:%M", time.localtime(run["updated"]))
+                st.markdown(f"[{run['name'] or 'Untitled RFP'}](?run={run['id']}) · {opened}")
+    
+    # Documents the Knowledge Retrieval Agent draws on
+    with st.expander("📚 Knowledge base"):
+        kb_documents = knowledge_base.documents()
+        st.caption(f"{len(kb_documents)} documents · {sum(count for _, _, count in kb_documents)} passages indexed")
+        kb_uploads = st.file_uploader(
+            "Add past proposals, CVs or case studies",
+            type=[extension.lstrip(".") for extension in SUPPORTED_EXTENSIONS],
+            accept_multiple_files=True,
+            key="kb_uploads"
+        )
+        if kb_uploads and st.button("Add to knowledge base", key="kb_ingest"):
+            os.makedirs(knowledge_base.documents_dir, exist_ok=True)
+            saved = []
+            for upload in kb_uploads:
+                path = os.path.join(knowledge_base.documents_dir, os.path.basename(upload.name))
+                with open(path, "wb") as f:
+                    f.write(upload.getvalue())
+                saved.append(path)
+            with st.spinner("Indexing documents..."):
+                knowledge_base.ingest(saved)
+            st.success(f"Indexed {len(saved)} documents.")
+        for _, title, count in kb_documents:
+            st.markdown(f"- {title} ({count} passages)")
 
 # Initialize session state for tracking progress and results
-if 'rfp_text' not in st.session_state:
-    st.session_state.rfp_text = None
-if 'requirements' not in st.session_state:
-    st.session_state.requirements = None
-if 'knowledge' not in st.session_state:
-    st.session_state.knowledge = None
-if 'response_draft' not in st.session_state:
-    st.session_state.response_draft = None
-if 'review' not in st.session_state:
-    st.session_state.review = None
+# Only the run id lives in the session; stage outputs are loaded from the run store on demand
+query_params = st.experimental_get_query_params()
+if 'run_id' not in st.session_state:
+    # Reopen a stored run from the URL
+    st.session_state.run_id = query_params.get("run", [None])[0]
 if 'processing_complete' not in st.session_state:
-    st.session_state.processing_complete = False
+    # A job id in the URL means a (re-)run is still being watched
+    st.session_state.processing_complete = (
+        st.session_state.run_id is not None
+        and "job" not in query_params
+        and "review" in run_store.stages(st.session_state.run_id)
+    )
+if 'client_id' not in st.session_state:
+    st.session_state.client_id = uuid.uuid4().hex
+if 'job_id' not in st.session_state:
+    # Reattach to a job started earlier in this browser tab (the id is kept in the URL)
+    st.session_state.job_id = query_params.get("job", [None])[0]
+
+def run_output(stage, default=None):
+    """Load a stage output of the current run from the run store"""
+    if st.session_state.run_id is None:
+        return default
+    return run_store.get(st.session_state.run_id, stage, default)
+
+def set_run_query_params():
+    """Keep the current run (and job) in the URL so the page can be reopened"""
+    params = {}
+    if st.session_state.run_id is not None:
+        params["run"] = st.session_state.run_id
+    if st.session_state.job_id is not None and not st.session_state.processing_complete:
+        params["job"] = st.session_state.job_id
+    st.experimental_set_query_params(**params)
 
 # Define uploaded_file at the global level before using it
 uploaded_file = None
 
 # Landing page with uploader
-if st.session_state.rfp_text is None and not st.session_state.processing_complete:
+if st.session_state.run_id is None and not st.session_state.processing_complete and st.session_state.job_id is None:
     # Hero section with animated illustration
     st.markdown("""
     <div class="hero-container">
@@ -1221,229 +1122,133 @@ if st.session_state.rfp_text is None and not st.session_state.processing_complet
     
     st.markdown('</div>', unsafe_allow_html=True)
 else:
-    # Add a new file uploader if process isn't complete yet
-    if not st.session_state.processing_complete:
+    # Add a new file uploader if process isn't complete or running yet
+    if not st.session_state.processing_complete and st.session_state.job_id is None:
         uploaded_file = st.file_uploader("Upload an RFP document (PDF)", type=["pdf"])
 
 # Extract text from uploaded document
 if uploaded_file is not None:
     # Extract text only if we haven't done it yet
-    if st.session_state.rfp_text is None:
-        # Save the uploaded file to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_path = tmp_file.name
+    if st.session_state.run_id is None:
+        # Extract text straight from the upload buffer, reporting progress per page
+        extraction_progress = st.progress(0.0, text="Extracting text from PDF...")
         
-        # Extract text from the PDF
-        with st.spinner("Extracting text from PDF..."):
-            pdf_reader = PdfReader(tmp_path)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            
-            os.unlink(tmp_path)  # Remove the temporary file
-            
-        st.session_state.rfp_text = text
+        def on_extraction_progress(done, total):
+            extraction_progress.progress(done / total, text=f"Extracting text from PDF... page {done} of {total}")
         
-        # Show confirmation
-        st.success(f"Successfully extracted {len(text)} characters from {uploaded_file.name}")
-
-# Process RFP button - when clicked, start the process
-if st.session_state.rfp_text is not None and not st.session_state.processing_complete:
-    if st.button("Start Multi-Agent Process", key="start_process"):
-        # Display animated agent card for Document Parser
-        st.markdown(f'''
-        <div class="agent-card">
-            <div class="agent-header">🔍 Document Parser Agent</div>
-            <div class="agent-status">Analyzing RFP document and extracting key requirements...</div>
-            <div class="animated-progress">
-                <div class="animated-progress-bar"></div>
-            </div>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Create a placeholder for the success message
-        success_placeholder1 = st.empty()
-        
-        # Process document parser agent - MODIFIED TO USE HARD-CODED REQUIREMENTS
-        with st.spinner("Extracting structured requirements..."):
-            # Instead of parsing the document, use our sample requirements
-            st.session_state.requirements = get_sample_rfp_requirements()
+        # A previously seen PDF (same bytes) is served from the extracted-text cache
+        pdf_bytes = uploaded_file.getvalue()
+        pages, from_cache = extract_pages_cached(pdf_bytes, on_progress=on_extraction_progress)
+        extraction_progress.empty()
+        text = join_pages(pages)
             
-            # Add a small delay to simulate processing time
-            time.sleep(2)
+        # Start a new stored run for this document
+        run_id = run_store.create_run(name=uploaded_file.name, pdf_sha256=pdf_digest(pdf_bytes))
+        run_store.put(run_id, "rfp_text", text)
+        st.session_state.run_id = run_id
+        set_run_query_params()
         
-        # Show success indicator with SVG animation
-        success_placeholder1.markdown(f'''
-        <div class="success-indicator">
-            <svg class="checkmark" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 52 52">
-                <circle class="checkmark-circle" cx="26" cy="26" r="25" fill="none"/>
-                <path class="checkmark-check" fill="none" d="M14.1 27.2l7.1 7.2 16.7-16.8"/>
-            </svg>
-            <p>✅ Document Parser Agent completed successfully!</p>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Display animated agent card for Knowledge Retrieval
-        st.markdown(f'''
-        <div class="agent-card">
-            <div class="agent-header">🧠 Knowledge Retrieval Agent</div>
-            <div class="agent-status">Searching company knowledge base for relevant information...</div>
-            <div class="animated-progress">
-                <div class="animated-progress-bar"></div>
-            </div>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Create a placeholder for the success message
-        success_placeholder2 = st.empty()
-        
-        # Process knowledge retrieval agent
-        with st.spinner("Retrieving relevant knowledge and past projects..."):
-            # Create prompt for Knowledge Retrieval Agent
-            knowledge_prompt = f"""Given these RFP requirements, provide relevant information that should be included in our response:
-            
-            {str(st.session_state.requirements)}
-            
-            Include:
-            1. Suggested past projects that demonstrate relevant experience
-            2. Key team members who should be mentioned
-            3. Standard service descriptions that match the requirements
-            4. Relevant compliance certifications and credentials
-            
-            Format as a structured list of recommendations.
-            """
-            
-            # Call Anthropic API with system prompt
-            knowledge_system_prompt = "You are a Knowledge Retrieval Agent for a professional services firm in Australia. You find relevant information from the company's knowledge base."
-            st.session_state.knowledge = call_anthropic_api(
-                knowledge_prompt, 
-                max_tokens=2000, 
-                temperature=0.2,
-                system_prompt=knowledge_system_prompt
-            )
-        
-        # Show success indicator with SVG animation
-        success_placeholder2.markdown(f'''
-        <div class="success-indicator">
-            <svg class="checkmark" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 52 52">
-                <circle class="checkmark-circle" cx="26" cy="26" r="25" fill="none"/>
-                <path class="checkmark-check" fill="none" d="M14.1 27.2l7.1 7.2 16.7-16.8"/>
-            </svg>
-            <p>✅ Knowledge Retrieval Agent completed successfully!</p>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Display animated agent card for Response Generator
-        st.markdown(f'''
-        <div class="agent-card">
-            <div class="agent-header">✍️ Response Generator Agent</div>
-            <div class="agent-status">Creating draft response sections based on requirements and knowledge...</div>
-            <div class="animated-progress">
-                <div class="animated-progress-bar"></div>
-            </div>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Create a placeholder for the success message
-        success_placeholder3 = st.empty()
+        # Show confirmation
+        source = " (cached)" if from_cache else ""
+        st.success(f"Successfully extracted {len(text)} characters from {len(pages)} pages of {uploaded_file.name}{source}")
         
-        # Process response generator agent
-        with st.spinner("Generating comprehensive response draft..."):
-            # Create prompt for Response Generator Agent
-            response_prompt = f"""Create draft responses for an RFP based on these requirements and available knowledge:
-            
-            RFP Requirements:
-            {str(st.session_state.requirements)}
-            
-            Available Knowledge:
-            {st.session_state.knowledge}
-            
-            Generate professional, compelling draft responses for key sections of the RFP.
-            Format each section with a clear heading and concise, value-focused content.
-            Use markdown formatting for better readability.
-            """
-            
-            # Call Anthropic API with system prompt
-            response_system_prompt = "You are a Response Generator Agent for an Australian professional services firm. You create professional RFP response content."
-            st.session_state.response_draft = call_anthropic_api(
-                response_prompt, 
-                max_tokens=3500, 
-                temperature=0.4,
-                system_prompt=response_system_prompt
+        # A re-issue or amendment of an earlier tender starts from that run's outputs
+        similar = rfp_index.find_similar(pages, exclude={run_id})
+        rfp_index.add(run_id, pages)
+        if similar:
+            previous = seed_from_previous(run_store, similar[0]["run_id"], run_id, pages, similar[0]["similarity"])
+            diff = previous["diff"]
+            st.info(
+                f"This looks like a new version of {previous['name']} ({previous['similarity']:.0%} similar): "
+                f"{len(diff['changed'])} changed, {len(diff['added'])} added and {len(diff['removed'])} removed pages. "
+                "Results the changes don't affect will be reused."
             )
-        
-        # Show success indicator with SVG animation
-        success_placeholder3.markdown(f'''
-        <div class="success-indicator">
-            <svg class="checkmark" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 52 52">
-                <circle class="checkmark-circle" cx="26" cy="26" r="25" fill="none"/>
-                <path class="checkmark-check" fill="none" d="M14.1 27.2l7.1 7.2 16.7-16.8"/>
-            </svg>
-            <p>✅ Response Generator Agent completed successfully!</p>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Display animated agent card for Quality Control
+
+# Agent cards shown while the pipeline runs, with the pipeline nodes whose progress each card reports
+AGENT_CARDS = [
+    ("requirements", "🔍 Document Parser Agent", "Analyzing RFP document and extracting key requirements...", ("requirements",)),
+    ("knowledge", "🧠 Knowledge Retrieval Agent", "Searching company knowledge base for relevant information...", tuple(KNOWLEDGE_CATEGORIES) + ("knowledge",)),
+    ("response_draft", "✍️ Response Generator Agent", "Creating draft response sections based on requirements and knowledge...", ("approved_answers", "response_draft")),
+    ("review", "🔍 Quality Control Agent", "Reviewing generated response for completeness and compliance...", ("review",)),
+]
+
+def render_agent_success(placeholder, agent_name):
+    """Show the animated success indicator for an agent"""
+    placeholder.markdown(f'''
+    <div class="success-indicator">
+        <svg class="checkmark" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 52 52">
+            <circle class="checkmark-circle" cx="26" cy="26" r="25" fill="none"/>
+            <path class="checkmark-check" fill="none" d="M14.1 27.2l7.1 7.2 16.7-16.8"/>
+        </svg>
+        <p>✅ {agent_name} completed successfully!</p>
+    </div>
+    ''', unsafe_allow_html=True)
+
+# Process RFP button - when clicked, submit the pipeline as a background job
+if st.session_state.run_id is not None and not st.session_state.processing_complete and st.session_state.job_id is None:
+    if st.button("Start Multi-Agent Process", key="start_process"):
+        st.session_state.job_id = job_runner.submit(
+            "rfp_pipeline",
+            run_rfp_job,
+            run_id=st.session_state.run_id,
+            client_id=st.session_state.client_id
+        )
+        set_run_query_params()
+        st.rerun()
+
+# Poll the running job and show each agent's live progress
+if st.session_state.job_id is not None and not st.session_state.processing_complete:
+    job = job_runner.get(st.session_state.job_id)
+    if job is None:
+        st.error("This RFP run could not be found. Please upload the document again.")
+        st.session_state.job_id = None
+        set_run_query_params()
+        st.stop()
+
+    snapshot = job.snapshot()
+    for card, agent_name, agent_status, stages in AGENT_CARDS:
         st.markdown(f'''
         <div class="agent-card">
-            <div class="agent-header">🔍 Quality Control Agent</div>
-            <div class="agent-status">Reviewing generated response for completeness and compliance...</div>
-            <div class="animated-progress">
-                <div class="animated-progress-bar"></div>
-            </div>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Create a placeholder for the success message
-        success_placeholder4 = st.empty()
-        
-        # Process quality control agent
-        with st.spinner("Performing comprehensive quality review..."):
-            # Create prompt for Quality Control Agent
-            review_prompt = f"""Review this draft RFP response against the requirements and provide feedback:
-            
-            Draft Response:
-            {st.session_state.response_draft}
-            
-            RFP Requirements:
-            {str(st.session_state.requirements)}
-            
-            Provide feedback on:
-            1. Completeness - Are all requirements addressed?
-            2. Compliance - Does it meet all compliance needs?
-            3. Consistency - Is the response consistent throughout?
-            4. Areas for improvement
-            5. Sections requiring human expert review
-            
-            Format your response in markdown with clear sections.
-            """
-            
-            # Call Anthropic API with system prompt
-            review_system_prompt = "You are a Quality Control Agent that reviews RFP responses for completeness, compliance, and quality."
-            st.session_state.review = call_anthropic_api(
-                review_prompt, 
-                max_tokens=2000, 
-                temperature=0,
-                system_prompt=review_system_prompt
-            )
-        
-        # Show success indicator with SVG animation
-        success_placeholder4.markdown(f'''
-        <div class="success-indicator">
-            <svg class="checkmark" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 52 52">
-                <circle class="checkmark-circle" cx="26" cy="26" r="25" fill="none"/>
-                <path class="checkmark-check" fill="none" d="M14.1 27.2l7.1 7.2 16.7-16.8"/>
-            </svg>
-            <p>✅ Quality Control Agent completed successfully!</p>
+            <div class="agent-header">{agent_name}</div>
+            <div class="agent-status">{agent_status}</div>
         </div>
         ''', unsafe_allow_html=True)
+
+        fractions = [snapshot["progress"].get(stage) for stage in stages]
+        if all(fraction == 1.0 for fraction in fractions):
+            st.progress(1.0, text="Completed")
+            render_agent_success(st.empty(), agent_name[2:].strip())
+        elif any(fraction is not None for fraction in fractions):
+            fraction = sum(fraction or 0.0 for fraction in fractions) / len(fractions)
+            st.progress(fraction, text=f"Running... {fraction:.0%}")
+            if snapshot["partial"].get(card):
+                st.markdown(snapshot["partial"][card] + " ▌")
+        else:
+            st.progress(0.0, text="Waiting...")
+
+    if snapshot["status"] == jobs.SUCCEEDED:
+        st.session_state.run_id = snapshot["result"]["run_id"]
+        job_runner.forget(job.id)
         
         # Mark processing as complete
         st.session_state.processing_complete = True
+        set_run_query_params()
         
         # Force page refresh to show results
         st.rerun()
+    elif snapshot["status"] in jobs.FINISHED_STATES:
+        # Retries are exhausted by now; report the failure and let the user try again
+        reason = (snapshot["error"] or "the server restarted while it was running").split("\n")[0]
+        st.error(f"The multi-agent process stopped: {reason}")
+        if st.button("Try again", key="retry_process"):
+            st.session_state.job_id = None
+            set_run_query_params()
+            st.rerun()
+    else:
+        # The job keeps running if this tab is closed; poll again shortly
+        st.caption("You can leave this page open or come back to this URL later - the run continues in the background.")
+        time.sleep(1)
+        st.rerun()
 
 # Display results if processing is complete
 if st.session_state.processing_complete:
@@ -1452,6 +1257,9 @@ if st.session_state.processing_complete:
     st.markdown("All agents have successfully completed their tasks. Review the outputs below and download the complete response when you're ready.")
     st.markdown("</div>", unsafe_allow_html=True)
     
+    # Stage outputs of the completed run, loaded lazily from the run store
+    requirements = run_output("requirements")
+    
     # Create tabs for different outputs
     tab1, tab2, tab3, tab4 = st.tabs(["📋 Requirements", "📚 Knowledge", "📝 Response Draft", "🔍 Quality Review"])
     
@@ -1459,22 +1267,22 @@ if st.session_state.processing_complete:
         st.subheader("Extracted Requirements")
         
         # Improved requirements tab display with proper debugging and error handling
-        if isinstance(st.session_state.requirements, dict):
+        if isinstance(requirements, dict):
             # Uncomment this for debugging if needed
             # st.write("Requirements data structure is valid")
-            # st.write(st.session_state.requirements)
+            # st.write(requirements)
             
-            if "error" in st.session_state.requirements:
-                st.error(st.session_state.requirements["error"])
-                if "raw_response" in st.session_state.requirements:
-                    st.text(st.session_state.requirements["raw_response"])
+            if "error" in requirements:
+                st.error(requirements["error"])
+                if "raw_response" in requirements:
+                    st.text(requirements["raw_response"])
             else:
                 # Before trying to access specific keys, check if they exist
                 req_keys = ["Key_Requirements_And_Deliverables", "Compliance_Needs", 
                            "Deadlines", "Evaluation_Criteria", "Required_Sections_For_The_Response"]
                 
                 for key in req_keys:
-                    if key in st.session_state.requirements:
+                    if key in requirements:
                         st.markdown(f'<div class="card">', unsafe_allow_html=True)
                         
                         # Use appropriate emoji and title based on key
@@ -1502,7 +1310,7 @@ if st.session_state.processing_complete:
                             st.markdown(subtitle_mapping[key])
                         
                         # Display data based on type
-                        data = st.session_state.requirements[key]
+                        data = requirements[key]
                         
                         # Handle different data structures appropriately
                         if isinstance(data, dict):
@@ -1538,25 +1346,31 @@ if st.session_state.processing_complete:
         else:
             # Fallback for completely invalid requirements
             st.error("Requirements data is not in the expected format")
-            st.write(f"Type: {type(st.session_state.requirements)}")
+            st.write(f"Type: {type(requirements)}")
             st.markdown("No structured requirements could be extracted. Please try another document or check system configuration.")
     
     with tab2:
         st.subheader("Relevant Knowledge")
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown(st.session_state.knowledge)
+        st.markdown(run_output("knowledge", ""))
         st.markdown('</div>', unsafe_allow_html=True)
     
     with tab3:
         st.subheader("Generated Response Draft")
+        approved_answers = run_output("approved_answers", [])
+        if approved_answers:
+            st.caption(f"{len(approved_answers)} requirement(s) answered from the approved-answer library")
+        previous_run = run_output("previous_run")
+        if previous_run:
+            st.caption(f"Sections unaffected by changes since {previous_run['name']} were reused from that run")
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown(st.session_state.response_draft)
+        st.markdown(run_output("response_draft", ""))
         st.markdown('</div>', unsafe_allow_html=True)
     
     with tab4:
         st.subheader("Quality Review")
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown(st.session_state.review)
+        st.markdown(run_output("review", ""))
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Modern dashboard header
@@ -1576,8 +1390,8 @@ if st.session_state.processing_complete:
         
         # Count requirements
         req_count = 0
-        if isinstance(st.session_state.requirements, dict) and "Key_Requirements_And_Deliverables" in st.session_state.requirements:
-            req_data = st.session_state.requirements["Key_Requirements_And_Deliverables"]
+        if isinstance(requirements, dict) and "Key_Requirements_And_Deliverables" in requirements:
+            req_data = requirements["Key_Requirements_And_Deliverables"]
             if isinstance(req_data, dict):
                 for category, items in req_data.items():
                     if isinstance(items, list):
@@ -1586,10 +1400,12 @@ if st.session_state.processing_complete:
                         req_count += 1
         
         # Estimate response completeness
+        review = run_output("review", "")
+        response_draft = run_output("response_draft", "")
         completeness = "N/A"
-        if st.session_state.review:
+        if review:
             # Look for percentages in the review text
-            percentages = re.findall(r'(\d+)%', st.session_state.review)
+            percentages = re.findall(r'(\d+)%', review)
             if percentages:
                 try:
                     # Use the first percentage found as completeness
@@ -1599,9 +1415,9 @@ if st.session_state.processing_complete:
         
         # Count sections in response
         section_count = 0
-        if st.session_state.response_draft:
+        if response_draft:
             # Count markdown headings as sections
-            section_count = st.session_state.response_draft.count('\n#')
+            section_count = response_draft.count('\n#')
         
         # Estimate time saved
         # Assume 30 minutes per requirement for manual processing
@@ -1636,6 +1452,30 @@ if st.session_state.processing_complete:
         </div>
         """, unsafe_allow_html=True)
         
+        # Per-agent timings from the pipeline run
+        stage_timings = run_output("stage_timings")
+        if stage_timings:
+            with st.expander("⏱️ Agent timings"):
+                reused_stages = run_output("reused_stages", [])
+                timings_df = pd.DataFrame([
+                    {
+                        "Stage": name,
+                        "Start (s)": round(t["start"], 2),
+                        "Duration (s)": round(t["duration"], 2),
+                        "Reused": name in reused_stages
+                    }
+                    for name, t in sorted(stage_timings.items(), key=lambda item: item[1]["start"])
+                ])
+                st.dataframe(timings_df, use_container_width=True, hide_index=True)
+                usage = run_output("token_usage")
+                if usage:
+                    st.caption(
+                        f"{usage['calls']} API calls · {usage['input_tokens']:,} input tokens · "
+                        f"{usage['cache_read_input_tokens']:,} read from prompt cache · "
+                        f"{usage['cache_creation_input_tokens']:,} written to prompt cache · "
+                        f"{usage['output_tokens']:,} output tokens"
+                    )
+        
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
@@ -1665,6 +1505,18 @@ if st.session_state.processing_complete:
     # Create downloads section
     st.markdown("### Export Options")
     
+    def render_export(fmt, label, description):
+        """Offer a download of cached export bytes, building them only when asked"""
+        try:
+            data = exports.cached_export(fmt, response_draft, review)
+            if data is None and st.button(f"Prepare {description}", key=f"prepare_{fmt}"):
+                with st.spinner(f"Generating {description}..."):
+                    data = exports.get_export(fmt, response_draft, review)
+            if data is not None:
+                st.download_button(label=label, data=data, key=f"download_{fmt}", **exports.EXPORT_FORMATS[fmt])
+        except Exception as e:
+            st.error(f"Error generating {description}: {str(e)}")
+    
     # Create columns for the two download options
     col1, col2 = st.columns(2)
     
@@ -1675,17 +1527,7 @@ if st.session_state.processing_complete:
         st.markdown('<div class="download-title">Word Document</div>', unsafe_allow_html=True)
         st.markdown('<div class="download-desc">Download as an editable Word document for further customization</div>', unsafe_allow_html=True)
         
-        try:
-            docx_buffer = generate_docx(st.session_state.response_draft, st.session_state.review)
-            
-            st.download_button(
-                label="📝 Download as Word",
-                data=docx_buffer,
-                file_name="rfp_response.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            )
-        except Exception as e:
-            st.error(f"Error generating Word document: {str(e)}")
+        render_export("docx", "📝 Download as Word", "Word document")
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -1696,17 +1538,7 @@ if st.session_state.processing_complete:
         st.markdown('<div class="download-title">PDF Document</div>', unsafe_allow_html=True)
         st.markdown('<div class="download-desc">Download as a professionally formatted PDF document</div>', unsafe_allow_html=True)
         
-        try:
-            pdf_buffer = generate_pdf(st.session_state.response_draft, st.session_state.review)
-            
-            st.download_button(
-                label="📑 Download as PDF",
-                data=pdf_buffer,
-                file_name="rfp_response.pdf",
-                mime="application/pdf"
-            )
-        except Exception as e:
-            st.error(f"Error generating PDF: {str(e)}")
+        render_export("pdf", "📑 Download as PDF", "PDF")
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -1714,14 +1546,47 @@ if st.session_state.processing_complete:
     st.markdown("### Next Steps")
     st.info("You can now review and refine the generated response before submitting.")
     
+    # Edit the requirements or pick sections to redraft; only affected stages are recomputed
+    with st.expander("🔁 Refine and re-run"):
+        edited_requirements = st.text_area(
+            "Requirements (JSON)",
+            value=json.dumps(requirements, indent=2, ensure_ascii=False) if isinstance(requirements, dict) else "",
+            height=300,
+            key="edited_requirements"
+        )
+        section_names = []
+        if isinstance(requirements, dict):
+            section_names = requirements.get("Required_Sections_For_The_Response") or []
+        redraft = st.multiselect("Sections to redraft", section_names, key="redraft_sections")
+        rerun_review = st.checkbox("Run the quality review again", key="rerun_review")
+        
+        if st.button("Re-run changed stages", key="rerun_process"):
+            try:
+                new_requirements = json.loads(edited_requirements)
+            except json.JSONDecodeError as e:
+                st.error(f"The requirements are not valid JSON: {e}")
+                st.stop()
+            if new_requirements != requirements:
+                run_store.put(st.session_state.run_id, "requirements", new_requirements)
+                run_store.put(st.session_state.run_id, "requirements_edited", True)
+            st.session_state.job_id = job_runner.submit(
+                "rfp_pipeline",
+                run_rfp_job,
+                run_id=st.session_state.run_id,
+                client_id=st.session_state.client_id,
+                force=["review"] if rerun_review else [],
+                regenerate_sections=redraft
+            )
+            st.session_state.processing_complete = False
+            set_run_query_params()
+            st.rerun()
+    
     if st.button("Start New RFP", key="reset"):
         # Reset all session state
-        st.session_state.rfp_text = None
-        st.session_state.requirements = None
-        st.session_state.knowledge = None
-        st.session_state.response_draft = None
-        st.session_state.review = None
+        st.session_state.run_id = None
+        st.session_state.job_id = None
         st.session_state.processing_complete = False
+        set_run_query_params()
         
         # Force page refresh
         st.rerun()
@@ -0,0 +1,256 @@
+"""Headless batch processing of many RFP PDFs.
+
+Runs text extraction, the multi-agent pipeline and the Word/PDF exports for
+every PDF in a directory or manifest, a few files at a time, and appends one
+JSON line per file (status, outputs, per-step timings, token usage) to a
+summary file in the output directory. Re-running the same command resumes:
+files already exported are skipped, and failed files reuse the stage outputs
+their earlier attempt stored in the run store.
+
+    python batch.py tenders/ --out responses/ --workers 4
+    python batch.py manifest.txt --out responses/ --formats docx
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import exports
+import llm_client
+from agents import build_rfp_pipeline
+from answer_library import get_answer_library
+from knowledge_base import get_knowledge_base
+from pdf_extract import extract_pages_cached, join_pages, pdf_digest
+from rfp_index import get_rfp_index, previous_outputs, seed_from_previous
+from run_store import RunMemo, get_store as get_run_store
+
+# Files processed concurrently; API calls are still admitted by the shared rate limiter
+BATCH_WORKERS = int(os.getenv("RFP_BATCH_WORKERS", "2"))
+SUMMARY_FILE = "summary.jsonl"
+
+
+def read_manifest(path):
+    """PDF paths from a manifest: one path per line, or JSON lines with a "path" key.
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    paths = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["path"]
+            paths.append(os.path.join(base, line))
+    return paths
+
+
+def collect_inputs(source):
+    """PDF paths from a directory (recursively, sorted) or a manifest file"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return sorted(paths)
+    return read_manifest(source)
+
+
+def load_summary(path):
+    """Latest summary record per PDF digest from an earlier (possibly interrupted) batch"""
+    records = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash
+                records[record["sha256"]] = record
+    return records
+
+
+def _output_name(path, digest):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{digest[:8]}"
+
+
+def process_file(path, out_dir, api_key, formats=("docx", "pdf"), run_id=None, client_id="batch"):
+    """Extract, run the agents and export one PDF; return its summary record.
+
+    run_id, if given, continues an earlier run of the same PDF so its
+    memoized stages are reused.
+    """
+    run_store = get_run_store()
+    started = time.perf_counter()
+    timings = {}
+
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    digest = pdf_digest(pdf_bytes)
+    record = {"file": path, "sha256": digest, "run_id": run_id, "status": "failed"}
+
+    try:
+        step = time.perf_counter()
+        pages, cache_hit = extract_pages_cached(pdf_bytes)
+        timings["extract"] = time.perf_counter() - step
+        record.update(pages=len(pages), text_cache_hit=cache_hit)
+
+        if run_id is None or run_store.get_run(run_id) is None:
+            run_id = run_store.create_run(os.path.basename(path), digest)
+            run_store.put(run_id, "rfp_text", join_pages(pages))
+            # Start a re-issued or amended tender from its earlier version's outputs
+            rfp_index = get_rfp_index()
+            similar = rfp_index.find_similar(pages, exclude={run_id})
+            rfp_index.add(run_id, pages)
+            if similar:
+                seed_from_previous(run_store, similar[0]["run_id"], run_id, pages, similar[0]["similarity"])
+        record["run_id"] = run_id
+        previous = run_store.get(run_id, "previous_run")
+        if previous is not None:
+            record["previous_run"] = {key: previous[key] for key in ("run_id", "name", "similarity")}
+
+        step = time.perf_counter()
+        usage = llm_client.UsageTracker()
+        memo = RunMemo(run_store, run_id)
+        rfp_pipeline = build_rfp_pipeline(
+            lambda prompt, **kwargs: llm_client.create_message(api_key, prompt, usage=usage, client_id=client_id, **kwargs),
+            memo=memo,
+            knowledge_base=get_knowledge_base(),
+            answer_library=get_answer_library(),
+            previous_run=previous_outputs(run_store, run_id)
+        )
+
+        def on_event(event):
+            if event["event"] == "end":
+                for key, value in event["outputs"].items():
+                    run_store.put(run_id, key, value)
+
+        context, stage_timings = rfp_pipeline.run(
+            {"rfp_text": run_store.get(run_id, "rfp_text")}, on_event=on_event, memo=memo
+        )
+        timings["pipeline"] = time.perf_counter() - step
+        timings["stages"] = {name: t["duration"] for name, t in stage_timings.items()}
+        run_store.put(run_id, "stage_timings", stage_timings)
+        run_store.put(run_id, "token_usage", usage.snapshot())
+        record["usage"] = usage.snapshot()
+        record["approved_answers"] = len(context.get("approved_answers", []))
+
+        step = time.perf_counter()
+        os.makedirs(out_dir, exist_ok=True)
+        outputs = {}
+        for fmt in formats:
+            target = os.path.join(out_dir, f"{_output_name(path, digest)}.{fmt}")
+            data = exports.get_export(fmt, context["response_draft"], context["review"])
+            with open(target, "wb") as f:
+                f.write(data)
+            outputs[fmt] = target
+        timings["export"] = time.perf_counter() - step
+        record.update(status="ok", outputs=outputs)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc()
+
+    timings["total"] = time.perf_counter() - started
+    record["timings"] = timings
+    record["finished"] = time.time()
+    return record
+
+
+def run_batch(paths, out_dir, api_key=None, workers=None, formats=("docx", "pdf"), force=False, on_record=None):
+    """Process every PDF in paths and return their summary records.
+
+    Files whose digest already has a successful record with its outputs
+    on disk are skipped unless force is true. Records are appended to
+    out_dir/summary.jsonl as each file finishes, and on_record(record), if
+    given, is called from the calling thread.
+    """
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY is not set")
+    os.makedirs(out_dir, exist_ok=True)
+    summary_path = os.path.join(out_dir, SUMMARY_FILE)
+    previous = load_summary(summary_path)
+    summary_lock = threading.Lock()
+    records = []
+
+    def finish(record):
+        with summary_lock:
+            with open(summary_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({k: v for k, v in record.items() if k != "traceback"}) + "\n")
+        records.append(record)
+        if on_record is not None:
+            on_record(record)
+
+    todo = []
+    seen = set()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest = pdf_digest(f.read())
+        if digest in seen:
+            continue
+        seen.add(digest)
+        earlier = previous.get(digest, {})
+        done = (
+            earlier.get("status") == "ok"
+            and all(os.path.exists(earlier.get("outputs", {}).get(fmt, "")) for fmt in formats)
+        )
+        if done and not force:
+            records.append(dict(earlier, status="skipped"))
+            if on_record is not None:
+                on_record(records[-1])
+            continue
+        todo.append((path, earlier.get("run_id")))
+
+    with ThreadPoolExecutor(max_workers=workers or BATCH_WORKERS) as pool:
+        futures = [
+            pool.submit(process_file, path, out_dir, api_key, formats, run_id, f"batch-{index}")
+            for index, (path, run_id) in enumerate(todo)
+        ]
+        for future in as_completed(futures):
+            finish(future.result())
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate RFP responses for a batch of PDFs")
+    parser.add_argument("source", help="directory of PDFs, or a manifest listing one PDF path per line")
+    parser.add_argument("--out", required=True, help="directory for the generated documents and summary.jsonl")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="files processed concurrently")
+    parser.add_argument("--formats", default="docx,pdf", help="comma-separated export formats (docx, pdf)")
+    parser.add_argument("--force", action="store_true", help="reprocess files that already have outputs")
+    args = parser.parse_args(argv)
+
+    formats = tuple(fmt.strip() for fmt in args.formats.split(",") if fmt.strip())
+    unknown = set(formats) - set(exports.EXPORT_FORMATS)
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+    paths = collect_inputs(args.source)
+    if not paths:
+        parser.error(f"no PDF files found in {args.source}")
+
+    def report(record):
+        total = record.get("timings", {}).get("total")
+        took = f" in {total:.1f}s" if total is not None and record["status"] != "skipped" else ""
+        print(f"[{record['status']}] {record['file']}{took}", file=sys.stderr)
+        if record["status"] == "failed":
+            print(f"    {record['error']}", file=sys.stderr)
+
+    started = time.perf_counter()
+    records = run_batch(paths, args.out, workers=args.workers, formats=formats, force=args.force, on_record=report)
+    failed = sum(record["status"] == "failed" for record in records)
+    print(
+        f"{len(records)} files, {failed} failed, {time.perf_counter() - started:.1f}s; "
+        f"summary in {os.path.join(args.out, SUMMARY_FILE)}",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
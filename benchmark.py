@@ -0,0 +1,263 @@
+"""End-to-end pipeline benchmark with a per-stage latency breakdown.
+
+Runs PDF extraction, prompt construction, every pipeline agent, markdown
+parsing and the Word/PDF exports against the bundled sample RFP and
+synthetic RFPs of 100/500/1000 pages. The LLM is the local stub server
+(stub_server.py) started in-process, so runs are offline and repeatable
+while still exercising the HTTP client, rate limiter and SSE parsing.
+The text, response and export caches are bypassed so every iteration does
+the full work.
+
+Reports p50/p95 per stage, peak RSS and throughput, writes the results as
+JSON, and compares against a stored baseline to catch regressions:
+
+    python benchmark.py --scenarios sample,synthetic-100 --repeat 5 --out bench.json
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+
+import exports
+import llm_client
+import stub_server
+from agents import KNOWLEDGE_CATEGORIES, build_rfp_pipeline, shared_context_system, RESPONSE_SYSTEM_PROMPT
+from cache import CACHE_DIR
+from pdf_extract import extract_pages, join_pages
+from prompts import budgeted, requirements_block
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sample RFP for Demo.pdf")
+SYNTHETIC_DIR = os.path.join(CACHE_DIR, "bench")
+SCENARIOS = ("sample", "synthetic-100", "synthetic-500", "synthetic-1000")
+
+# Stage differences smaller than this are noise, whatever the relative change
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def synthetic_pdf(pages):
+    """Path of a generated RFP with the given number of pages, built once and kept"""
+    path = os.path.join(SYNTHETIC_DIR, f"synthetic-{pages}.pdf")
+    if os.path.exists(path):
+        return path
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+    sections = ("Scope of Work", "Deliverables", "Compliance", "Evaluation Criteria", "Timeline")
+    pdf = canvas.Canvas(path + ".tmp", pagesize=A4)
+    for page in range(pages):
+        section = sections[page % len(sections)]
+        pdf.setFont("Helvetica-Bold", 13)
+        pdf.drawString(50, 800, f"{page // len(sections) + 1}.{page % len(sections) + 1} {section}")
+        pdf.setFont("Helvetica", 10)
+        for line in range(45):
+            number = page * 45 + line
+            pdf.drawString(50, 775 - line * 16, (
+                f"R{number:06d} The supplier shall provide {section.lower()} services meeting "
+                f"requirement {number} with monthly reporting and ISO 27001 controls."
+            ))
+        pdf.showPage()
+    pdf.save()
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def scenario_pdf(name):
+    if name == "sample":
+        return SAMPLE_PDF
+    return synthetic_pdf(int(name.split("-", 1)[1]))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children, in MB"""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) * scale / (1024 * 1024), 1)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = fraction * (len(ordered) - 1)
+    low = int(index)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+def run_once(pdf_bytes, llm, stream_llm):
+    """One end-to-end pass; returns ({stage: seconds}, page count)"""
+    stages = {}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        stages[stage] = time.perf_counter() - start
+        return result
+
+    pages = timed("pdf_extract", extract_pages, pdf_bytes)
+    rfp_text = join_pages(pages)
+
+    context, timings = timed("pipeline", build_rfp_pipeline(llm, node_llms={"review": stream_llm}).run, {"rfp_text": rfp_text})
+    for name, timing in timings.items():
+        stages[f"agent:{name}"] = timing["duration"]
+
+    # Prompt construction on its own, without the model calls around it
+    def build_prompts(requirements, knowledge):
+        for categories in KNOWLEDGE_CATEGORIES.values():
+            requirements_block({key: requirements[key] for key in categories if key in requirements}, "knowledge")
+        shared_context_system(requirements, RESPONSE_SYSTEM_PROMPT)
+        budgeted(knowledge, "section", "knowledge")
+    timed("prompt_build", build_prompts, context["requirements"], context["knowledge"])
+
+    def parse_both(response_draft, review):
+        exports.parse_markdown.cache_clear()
+        exports.parse_markdown(response_draft)
+        exports.parse_markdown(review)
+    timed("markdown_parse", parse_both, context["response_draft"], context["review"])
+    timed("export_docx", exports.generate_docx, context["response_draft"], context["review"])
+    timed("export_pdf", exports.generate_pdf, context["response_draft"], context["review"])
+    stages["total"] = sum(value for key, value in stages.items() if not key.startswith("agent:"))
+    return stages, len(pages)
+
+
+def run_scenario(name, repeat, llm, stream_llm, warmup=1):
+    with open(scenario_pdf(name), "rb") as f:
+        pdf_bytes = f.read()
+    samples = {}
+    page_count = 0
+    for iteration in range(warmup + repeat):
+        stages, page_count = run_once(pdf_bytes, llm, stream_llm)
+        if iteration < warmup:
+            continue
+        for stage, seconds in stages.items():
+            samples.setdefault(stage, []).append(seconds)
+
+    total_p50 = percentile(samples["total"], 0.5)
+    extract_p50 = percentile(samples["pdf_extract"], 0.5)
+    return {
+        "pages": page_count,
+        "repeat": repeat,
+        "stages": {
+            stage: {
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "mean": statistics.fmean(values),
+                "n": len(values),
+            }
+            for stage, values in samples.items()
+        },
+        "throughput": {
+            "rfps_per_hour": 3600 / total_p50 if total_p50 else None,
+            "pages_per_second": page_count / total_p50 if total_p50 else None,
+            "extract_pages_per_second": page_count / extract_p50 if extract_p50 else None,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """List of p50 regressions beyond tolerance (a fraction) relative to baseline"""
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for stage, stats in scenario["stages"].items():
+            before = previous["stages"].get(stage, {}).get("p50")
+            if before is None:
+                continue
+            after = stats["p50"]
+            if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append({
+                    "scenario": name, "stage": stage, "baseline_p50": before, "p50": after,
+                    "change": (after - before) / before if before else None,
+                })
+    return regressions
+
+
+def print_report(results, regressions):
+    for name, scenario in results["scenarios"].items():
+        throughput = scenario["throughput"]
+        print(f"\n{name}: {scenario['pages']} pages, peak RSS {scenario['peak_rss_mb']} MB, "
+              f"{throughput['rfps_per_hour']:.0f} RFPs/hour, {throughput['extract_pages_per_second']:.0f} pages/s extracted")
+        print(f"  {'stage':<32}{'p50 (s)':>10}{'p95 (s)':>10}")
+        for stage, stats in scenario["stages"].items():
+            print(f"  {stage:<32}{stats['p50']:>10.3f}{stats['p95']:>10.3f}")
+    for regression in regressions:
+        print(f"REGRESSION {regression['scenario']} {regression['stage']}: "
+              f"{regression['baseline_p50']:.3f}s -> {regression['p50']:.3f}s ({regression['change']:+.0%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the RFP pipeline against a local stub LLM")
+    parser.add_argument("--scenarios", default="sample,synthetic-100", help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=5, help="measured iterations per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured iterations per scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub time to first byte, seconds")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="stub output speed; 0 is instant")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare p50s with this results file")
+    parser.add_argument("--save-baseline", help="write results to this file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before a stage counts as a regression")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS and not name.startswith("synthetic-")]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    # The stub has no rate limit, and the client's limiter would only measure itself
+    llm_client.RATE_LIMIT_CONFIG.update(requests_per_minute=10 ** 9, input_tokens_per_minute=10 ** 12)
+    server, base_url = stub_server.start_in_background(port=0, config={
+        "latency": args.llm_latency, "tokens_per_second": args.llm_tokens_per_second,
+    })
+    llm_client.configure(base_url=base_url)
+
+    def llm(prompt, **kwargs):
+        return llm_client.create_message("stub", prompt, use_cache=False, **kwargs)
+
+    def stream_llm(prompt, **kwargs):
+        return "".join(llm_client.stream_message("stub", prompt, use_cache=False, **kwargs))
+
+    results = {
+        "meta": {
+            "created": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "llm_latency": args.llm_latency,
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results["scenarios"][name] = run_scenario(name, args.repeat, llm, stream_llm, warmup=args.warmup)
+    finally:
+        server.shutdown()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+    print_report(results, regressions)
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
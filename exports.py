@@ -0,0 +1,359 @@
+"""Word and PDF export of the RFP response and its quality review.
+
+Markdown is parsed once per document version into a flat list of blocks
+(headings, paragraphs, bullet and numbered list items, tables and code),
+each holding inline spans (plain, bold or code). Both the python-docx and
+the ReportLab backends render from the same block list, so the two exports
+have the same fidelity.
+
+Finished exports are memoized by a hash of (format, response, review,
+template version) in a small in-memory LRU backed by an on-disk cache, so
+the results page only builds a document when the user asks for it and never
+rebuilds the same one.
+"""
+import functools
+import os
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from cache import CACHE_DIR, SqliteCache, hash_payload
+
+# Bump when the layout of the generated documents changes to invalidate cached exports
+TEMPLATE_VERSION = "2"
+
+# Built exports kept in memory (most recently used) and on disk
+EXPORT_MEMORY_ITEMS = int(os.getenv("RFP_EXPORT_MEMORY_ITEMS", "16"))
+EXPORT_CACHE_PATH = os.getenv("RFP_EXPORT_CACHE_PATH", os.path.join(CACHE_DIR, "exports.sqlite"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("RFP_EXPORT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+EXPORT_CACHE_MAX_ENTRIES = int(os.getenv("RFP_EXPORT_CACHE_MAX_ENTRIES", "200"))
+
+EXPORT_FORMATS = {
+    "docx": {"mime": "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "file_name": "rfp_response.docx"},
+    "pdf": {"mime": "application/pdf", "file_name": "rfp_response.pdf"},
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_NUMBERED = re.compile(r"^(\s*)(\d+)[.)]\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_INLINE = re.compile(r"(`[^`]+`|\*\*.+?\*\*|__.+?__)")
+
+
+def parse_inline(text):
+    """Split text into (text, style) spans; style is None, "bold" or "code" """
+    spans = []
+    for piece in _INLINE.split(text):
+        if not piece:
+            continue
+        if piece.startswith("`") and piece.endswith("`") and len(piece) > 1:
+            spans.append((piece[1:-1], "code"))
+        elif piece[:2] in ("**", "__") and piece[-2:] == piece[:2] and len(piece) > 4:
+            spans.append((piece[2:-2], "bold"))
+        else:
+            spans.append((piece, None))
+    return spans
+
+
+def _table_cells(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [parse_inline(cell.strip()) for cell in line.split("|")]
+
+
+@functools.lru_cache(maxsize=32)
+def parse_markdown(text):
+    """Parse markdown into a tuple of block dicts in a single pass over the lines.
+
+    Block types: heading (level, spans), paragraph (spans), list_item
+    (ordered, number, depth, spans), table (header, rows) and code (text).
+    Results are memoized by text, so each document version is parsed once.
+    """
+    blocks = []
+    paragraph = []
+    lines = (text or "").split("\n")
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append({"type": "paragraph", "spans": parse_inline(" ".join(paragraph))})
+            paragraph.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        i += 1
+
+        if stripped.startswith("```"):
+            flush_paragraph()
+            code = []
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code.append(lines[i])
+                i += 1
+            i += 1  # closing fence
+            blocks.append({"type": "code", "text": "\n".join(code)})
+            continue
+
+        if not stripped or _RULE.match(stripped):
+            flush_paragraph()
+            continue
+
+        heading = _HEADING.match(stripped)
+        if heading:
+            flush_paragraph()
+            blocks.append({"type": "heading", "level": len(heading.group(1)), "spans": parse_inline(heading.group(2))})
+            continue
+
+        # A table is a row of cells followed by a |---|---| separator line
+        if "|" in stripped and i < len(lines) and _TABLE_SEPARATOR.match(lines[i]):
+            flush_paragraph()
+            header = _table_cells(stripped)
+            rows = []
+            i += 1
+            while i < len(lines) and "|" in lines[i] and lines[i].strip():
+                rows.append(_table_cells(lines[i]))
+                i += 1
+            blocks.append({"type": "table", "header": header, "rows": rows})
+            continue
+
+        numbered = _NUMBERED.match(line)
+        bullet = None if numbered else _BULLET.match(line)
+        if numbered or bullet:
+            flush_paragraph()
+            match = numbered or bullet
+            blocks.append({
+                "type": "list_item",
+                "ordered": bool(numbered),
+                "number": int(numbered.group(2)) if numbered else None,
+                "depth": len(match.group(1).expandtabs(4)) // 2,
+                "spans": parse_inline(match.group(match.lastindex)),
+            })
+            continue
+
+        paragraph.append(stripped)
+
+    flush_paragraph()
+    return tuple(blocks)
+
+
+def _list_marker(block):
+    return f"{block['number']}." if block["ordered"] else "•"
+
+
+# PDF backend
+
+def _pdf_markup(spans):
+    from xml.sax.saxutils import escape
+
+    parts = []
+    for text, style in spans:
+        text = escape(text)
+        if style == "bold":
+            parts.append(f"<b>{text}</b>")
+        elif style == "code":
+            parts.append(f'<font face="Courier">{text}</font>')
+        else:
+            parts.append(text)
+    return "".join(parts)
+
+
+def _pdf_blocks(blocks, styles):
+    from reportlab.lib import colors
+    from reportlab.platypus import Paragraph, Preformatted, Table, TableStyle
+
+    content = []
+    for block in blocks:
+        kind = block["type"]
+        if kind == "heading":
+            style = styles["title"] if block["level"] == 1 else styles["heading2"]
+            content.append(Paragraph(_pdf_markup(block["spans"]), style))
+        elif kind == "paragraph":
+            content.append(Paragraph(_pdf_markup(block["spans"]), styles["normal"]))
+        elif kind == "list_item":
+            content.append(Paragraph(
+                _pdf_markup(block["spans"]),
+                styles["list"][min(block["depth"], len(styles["list"]) - 1)],
+                bulletText=_list_marker(block)
+            ))
+        elif kind == "table":
+            data = [[Paragraph(_pdf_markup(cell), styles["cell"]) for cell in row] for row in [block["header"]] + block["rows"]]
+            width = max(len(row) for row in data)
+            data = [row + [""] * (width - len(row)) for row in data]
+            table = Table(data, repeatRows=1, hAlign="LEFT")
+            table.setStyle(TableStyle([
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#94a3b8")),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e0e7ff")),
+                ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ]))
+            content.append(table)
+        elif kind == "code":
+            content.append(Preformatted(block["text"], styles["code"]))
+    return content
+
+
+def generate_pdf(response_draft, review):
+    """Generate a PDF document from the RFP response and review"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    # Create a BytesIO buffer to receive the PDF data
+    buffer = BytesIO()
+
+    # Create the PDF document
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    sample = getSampleStyleSheet()
+
+    normal_style = ParagraphStyle('Normal', parent=sample['Normal'], fontSize=11, spaceAfter=8)
+    styles = {
+        "title": ParagraphStyle('Title', parent=sample['Heading1'], fontSize=16, textColor=colors.HexColor('#1e3a8a'), spaceAfter=12),
+        "heading2": ParagraphStyle('Heading2', parent=sample['Heading2'], fontSize=14, textColor=colors.HexColor('#1e40af'), spaceAfter=10),
+        "normal": normal_style,
+        "list": [
+            ParagraphStyle(f'List{depth}', parent=normal_style, leftIndent=18 * (depth + 1), bulletIndent=18 * depth + 6, spaceAfter=4)
+            for depth in range(4)
+        ],
+        "cell": ParagraphStyle('Cell', parent=normal_style, fontSize=10, spaceAfter=0),
+        "code": ParagraphStyle('Code', parent=sample['Code'], fontSize=9, spaceAfter=8),
+    }
+
+    content = [Paragraph("RFP Response Draft", styles["title"]), Spacer(1, 12)]
+    content.extend(_pdf_blocks(parse_markdown(response_draft), styles))
+
+    # Add review section
+    content.extend([Spacer(1, 20), Paragraph("Quality Review", styles["title"]), Spacer(1, 12)])
+    content.extend(_pdf_blocks(parse_markdown(review), styles))
+
+    # Build the PDF
+    doc.build(content)
+    buffer.seek(0)
+    return buffer
+
+
+# Word backend
+
+def _docx_runs(paragraph, spans, bold=False):
+    for text, style in spans:
+        run = paragraph.add_run(text)
+        if bold or style == "bold":
+            run.bold = True
+        if style == "code":
+            run.font.name = "Courier New"
+
+
+def _docx_blocks(doc, blocks):
+    from docx.shared import Pt
+
+    for block in blocks:
+        kind = block["type"]
+        if kind == "heading":
+            heading = doc.add_heading(level=min(block["level"], 9))
+            _docx_runs(heading, block["spans"])
+        elif kind == "paragraph":
+            _docx_runs(doc.add_paragraph(), block["spans"])
+        elif kind == "list_item":
+            # Markers are written out so numbering matches the markdown exactly
+            p = doc.add_paragraph()
+            p.paragraph_format.left_indent = Pt(18 * (block["depth"] + 1))
+            p.paragraph_format.first_line_indent = Pt(-12)
+            p.add_run(_list_marker(block) + " ")
+            _docx_runs(p, block["spans"])
+        elif kind == "table":
+            rows = [block["header"]] + block["rows"]
+            table = doc.add_table(rows=len(rows), cols=max(len(row) for row in rows))
+            table.style = "Table Grid"
+            for r, row in enumerate(rows):
+                for c, cell in enumerate(row):
+                    _docx_runs(table.cell(r, c).paragraphs[0], cell, bold=(r == 0))
+        elif kind == "code":
+            p = doc.add_paragraph()
+            run = p.add_run(block["text"])
+            run.font.name = "Courier New"
+            run.font.size = Pt(9)
+
+
+def generate_docx(response_draft, review):
+    """Generate a Word document from the RFP response and review"""
+    from docx import Document
+    from docx.shared import Pt
+
+    # Create a new Document
+    doc = Document()
+
+    # Add a title
+    title = doc.add_heading("RFP Response Draft", level=1)
+    title.runs[0].font.size = Pt(18)
+
+    _docx_blocks(doc, parse_markdown(response_draft))
+
+    # Add a page break before the review section
+    doc.add_page_break()
+    doc.add_heading("Quality Review", level=1)
+    _docx_blocks(doc, parse_markdown(review))
+
+    # Save the document to a BytesIO buffer
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+_generators = {"docx": generate_docx, "pdf": generate_pdf}
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_export_cache = None
+
+
+def get_export_cache():
+    global _export_cache
+    if _export_cache is None:
+        with _memory_lock:
+            if _export_cache is None:
+                _export_cache = SqliteCache(
+                    EXPORT_CACHE_PATH,
+                    max_entries=EXPORT_CACHE_MAX_ENTRIES,
+                    max_bytes=EXPORT_CACHE_MAX_BYTES
+                )
+    return _export_cache
+
+
+def export_key(fmt, response_draft, review):
+    return hash_payload({"format": fmt, "response_draft": response_draft, "review": review, "template": TEMPLATE_VERSION})
+
+
+def _remember(key, data):
+    with _memory_lock:
+        _memory[key] = data
+        _memory.move_to_end(key)
+        while len(_memory) > EXPORT_MEMORY_ITEMS:
+            _memory.popitem(last=False)
+
+
+def cached_export(fmt, response_draft, review):
+    """Return the export's bytes if it was built before, else None"""
+    key = export_key(fmt, response_draft, review)
+    with _memory_lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key]
+    data = get_export_cache().get(key)
+    if data is not None:
+        _remember(key, data)
+    return data
+
+
+def get_export(fmt, response_draft, review):
+    """Return the export's bytes ("docx" or "pdf"), building it only on a cache miss"""
+    data = cached_export(fmt, response_draft, review)
+    if data is None:
+        data = _generators[fmt](response_draft, review).getvalue()
+        key = export_key(fmt, response_draft, review)
+        get_export_cache().set(key, data)
+        _remember(key, data)
+    return data
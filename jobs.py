@@ -0,0 +1,254 @@
+"""Background job runner for long multi-agent runs.
+
+Jobs execute on a process-wide worker pool instead of the Streamlit script
+thread, so reruns, widget interactions and closed tabs don't kill a run.
+Live progress is kept in memory for fast polling, and dropped a while after
+the job finishes; status, results and errors are persisted to SQLite so a
+finished job can be reopened by id, even after the server restarts.
+
+Several app replicas may share the database (RFP_DATA_DIR). Each job records
+the process that runs it, and a job left queued or running is only marked
+interrupted once that process is known to be gone.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import DATA_DIR
+
+JOB_WORKERS = int(os.getenv("RFP_JOB_WORKERS", "4"))
+# Seconds a finished job's live state stays in memory; its record stays in the database
+FINISHED_JOB_TTL = float(os.getenv("RFP_FINISHED_JOB_TTL", "300"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, INTERRUPTED = "queued", "running", "succeeded", "failed", "interrupted"
+FINISHED_STATES = (SUCCEEDED, FAILED, INTERRUPTED)
+
+
+class Job:
+    """State of one submitted job.
+
+    The job function receives the Job and may update `progress` (stage ->
+    fraction complete) and `partial` (stage -> text so far); the runner
+    takes care of status, result and error.
+    """
+
+    def __init__(self, job_id, kind, status=QUEUED, created=None):
+        self.id = job_id
+        self.kind = kind
+        self.status = status
+        self.created = created or time.time()
+        self.started = None
+        self.finished = None
+        self.progress = {}
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    def set_progress(self, stage, fraction):
+        with self._lock:
+            self.progress[stage] = fraction
+
+    def set_partial(self, stage, text):
+        with self._lock:
+            self.partial[stage] = text
+
+    def snapshot(self):
+        """A consistent copy of the job state for rendering"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "progress": dict(self.progress),
+                "partial": dict(self.partial),
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+def process_owner():
+    """host:boot id:pid of this process, recorded with the jobs it runs"""
+    try:
+        with open("/proc/sys/kernel/random/boot_id", encoding="utf-8") as f:
+            boot_id = f.read().strip()
+    except OSError:
+        boot_id = ""
+    return f"{socket.gethostname()}:{boot_id}:{os.getpid()}"
+
+
+def owner_gone(owner, current):
+    """Whether the process that recorded owner has certainly stopped, as seen from current.
+
+    Only processes on this host can be checked; another host's are assumed
+    alive. A job of this very pid that isn't live in memory belonged to an
+    earlier process that had the same pid.
+    """
+    if not owner:
+        return True  # recorded before jobs had owners
+    host, boot_id, pid = owner.rsplit(":", 2)
+    this_host, this_boot_id, this_pid = current.rsplit(":", 2)
+    if host != this_host:
+        return False
+    if boot_id != this_boot_id:
+        return True
+    if pid == this_pid:
+        return True
+    if os.name == "nt":
+        return False  # os.kill() would terminate the process rather than probe it
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class JobRunner:
+    def __init__(self, db_path, max_workers=JOB_WORKERS, finished_ttl=FINISHED_JOB_TTL):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                result TEXT,
+                error TEXT,
+                owner TEXT
+            )"""
+        )
+        if "owner" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self.owner = process_owner()
+        # Jobs in flight in a server process that has stopped can't resume; other replicas' jobs are left alone
+        in_flight = self._conn.execute("SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        for job_id, owner in in_flight:
+            if owner_gone(owner, self.owner):
+                self._interrupt(job_id)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rfp-job")
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._finished_ttl = finished_ttl
+
+    def _save(self, job):
+        with self._db_lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO jobs (id, kind, status, created, started, finished, result, error, owner)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    job.id, job.kind, job.status, job.created, job.started, job.finished,
+                    json.dumps(job.result) if job.result is not None else None,
+                    job.error, self.owner
+                )
+            )
+
+    def _interrupt(self, job_id):
+        # Only if still in flight, in case its owner finished it meanwhile
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+            (INTERRUPTED, time.time(), job_id, QUEUED, RUNNING)
+        )
+
+    def submit(self, kind, func, **kwargs):
+        """Queue func(job, **kwargs) and return the new job id.
+
+        func's return value must be JSON-serialisable; it becomes job.result.
+        """
+        job = Job(uuid.uuid4().hex, kind)
+        with self._jobs_lock:
+            self._evict_finished()
+            self._jobs[job.id] = job
+        self._save(job)
+        self._executor.submit(self._run, job, func, kwargs)
+        return job.id
+
+    def _run(self, job, func, kwargs):
+        job.status = RUNNING
+        job.started = time.time()
+        self._save(job)
+        try:
+            result = func(job, **kwargs)
+        except Exception as e:
+            job.error = f"{e}\n\n{traceback.format_exc()}"
+            job.status = FAILED
+        else:
+            job.result = result
+            job.status = SUCCEEDED
+        job.finished = time.time()
+        self._save(job)
+
+    def get(self, job_id):
+        """Return the live Job, or one loaded from the database, or None"""
+        with self._jobs_lock:
+            self._evict_finished()
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, created, started, finished, result, error, owner FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is not None and row[2] in (QUEUED, RUNNING) and owner_gone(row[8], self.owner):
+                # Its replica stopped since the job was submitted
+                self._interrupt(job_id)
+                row = self._conn.execute(
+                    "SELECT id, kind, status, created, started, finished, result, error, owner FROM jobs WHERE id = ?",
+                    (job_id,)
+                ).fetchone()
+        if row is None:
+            return None
+        job = Job(row[0], row[1], status=row[2], created=row[3])
+        job.started, job.finished = row[4], row[5]
+        job.result = json.loads(row[6]) if row[6] is not None else None
+        job.error = row[7]
+        return job
+
+    def _evict_finished(self):
+        # Failed jobs and jobs whose tab was closed are never forgotten explicitly
+        cutoff = time.time() - self._finished_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and (job.finished or 0) < cutoff]:
+            del self._jobs[job_id]
+
+    def forget(self, job_id):
+        """Drop a finished job from memory; its record stays in the database"""
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Return the process-wide job runner, shared by all Streamlit sessions"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner(os.path.join(DATA_DIR, "jobs.sqlite"))
+    return _runner
@@ -0,0 +1,599 @@
+"""Local company knowledge base for the Knowledge Retrieval Agent.
+
+Past proposals, CVs and case studies (DOCX, PDF, Markdown or text) are split
+into passages of a few paragraphs and indexed on disk: a BM25 inverted index
+over word tokens, plus (optionally) hashed dense vectors in a NumPy array
+that re-rank the BM25 candidates by cosine similarity. The index is stored
+as memory-mapped segments, so startup cost and per-process memory stay flat
+as the corpus grows, and re-ingesting a folder only processes files that
+changed. Retrieval runs locally in milliseconds; the agent then only has to
+summarise the passages it is given instead of inventing experience.
+
+    python knowledge_base.py ingest proposals/ cvs/ case_studies.md
+    python knowledge_base.py search "ISO 27001 certified ERP implementation"
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import shutil
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within a process
+    fcntl = None
+
+from cache import DATA_DIR, hash_payload
+from text_index import hashed_vector, term_hashes, tokenize
+
+KB_DIR = os.getenv("RFP_KB_DIR", os.path.join(DATA_DIR, "knowledge_base"))
+SUPPORTED_EXTENSIONS = (".docx", ".pdf", ".md", ".markdown", ".txt")
+
+# Passage size in words, with some overlap so facts at a boundary stay together
+PASSAGE_WORDS = int(os.getenv("RFP_KB_PASSAGE_WORDS", "180"))
+PASSAGE_OVERLAP = int(os.getenv("RFP_KB_PASSAGE_OVERLAP", "30"))
+
+# Retrieval settings
+KB_TOP_K = int(os.getenv("RFP_KB_TOP_K", "3"))  # passages per requirement
+KB_MAX_PASSAGES = int(os.getenv("RFP_KB_MAX_PASSAGES", "12"))  # passages per knowledge lookup
+KB_DENSE = os.getenv("RFP_KB_DENSE", "1") != "0"
+KB_DENSE_DIMS = int(os.getenv("RFP_KB_DENSE_DIMS", "512"))
+KB_DENSE_WEIGHT = float(os.getenv("RFP_KB_DENSE_WEIGHT", "0.3"))
+# Segments are merged into one once there are more than this many
+KB_MAX_SEGMENTS = int(os.getenv("RFP_KB_MAX_SEGMENTS", "8"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def read_document(path):
+    """Plain text of a DOCX, PDF, Markdown or text file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        from pdf_extract import extract_pages, join_pages
+
+        with open(path, "rb") as f:
+            return join_pages(extract_pages(f.read()))
+    if extension == ".docx":
+        from docx import Document
+
+        doc = Document(path)
+        parts = [paragraph.text for paragraph in doc.paragraphs]
+        for table in doc.tables:
+            for row in table.rows:
+                parts.append(" | ".join(cell.text for cell in row.cells))
+        return "\n\n".join(parts)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def split_passages(text, max_words=None, overlap=None):
+    """Split text into passages of whole paragraphs, at most max_words each.
+
+    Paragraphs longer than max_words are cut into overlapping word windows.
+    """
+    max_words = max_words or PASSAGE_WORDS
+    overlap = PASSAGE_OVERLAP if overlap is None else overlap
+    passages, current = [], []
+    for paragraph in text.replace("\r", "").split("\n\n"):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and len(current) + len(words) > max_words:
+            passages.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+        if len(words) > max_words:
+            step = max(1, max_words - overlap)
+            for start in range(0, len(words), step):
+                passages.append(" ".join(words[start:start + max_words]))
+                if start + max_words >= len(words):
+                    break
+            current = []
+        else:
+            current.extend(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def collect_files(paths):
+    """Supported files under the given files and directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith("~$")
+                )
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append(path)
+    return files
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _save_array(path, array):
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+class Segment:
+    """One immutable, memory-mapped slice of the index.
+
+    Files in the segment directory:
+      passages.bin / offsets.npy    JSON records {"doc", "title", "text"} and their byte offsets
+      lengths.npy                   token count of each passage
+      terms.npy / term_offsets.npy  sorted 64-bit term hashes and where their postings start
+      pids.npy / tfs.npy            postings: passage number and term frequency
+      vectors.npy                   hashed dense vectors (optional)
+    Arrays are opened with mmap, so loading costs O(1) and the pages are
+    shared through the OS page cache by every process using the index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.id = os.path.basename(path)
+
+        def load(name):
+            file = os.path.join(path, name)
+            return np.load(file, mmap_mode="r") if os.path.exists(file) else None
+
+        self.offsets = load("offsets.npy")
+        self.lengths = load("lengths.npy")
+        self.terms = load("terms.npy")
+        self.term_offsets = load("term_offsets.npy")
+        self.pids = load("pids.npy")
+        self.tfs = load("tfs.npy")
+        self.vectors = load("vectors.npy")
+        with open(os.path.join(path, "passages.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._passages = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def raw_record(self, pid):
+        return self._passages[int(self.offsets[pid]):int(self.offsets[pid + 1])]
+
+    def record(self, pid):
+        return json.loads(self.raw_record(pid))
+
+    def postings(self, term_hash):
+        """(pids, tfs) of a term, or None if the segment doesn't contain it"""
+        index = int(np.searchsorted(self.terms, term_hash))
+        if index >= len(self.terms) or self.terms[index] != term_hash:
+            return None
+        start, stop = int(self.term_offsets[index]), int(self.term_offsets[index + 1])
+        return self.pids[start:stop], self.tfs[start:stop]
+
+    def expanded_postings(self):
+        """(term hash, pid, tf) arrays with one entry per posting"""
+        counts = np.diff(np.asarray(self.term_offsets))
+        return np.repeat(np.asarray(self.terms), counts), np.asarray(self.pids), np.asarray(self.tfs)
+
+    @staticmethod
+    def write(path, records, lengths, terms, pids, tfs, vectors=None):
+        """Write a segment from passage records and unsorted (term hash, pid, tf) postings"""
+        os.makedirs(path, exist_ok=True)
+        offsets = [0]
+        with open(os.path.join(path, "passages.bin"), "wb") as f:
+            for record in records:
+                data = record if isinstance(record, bytes) else json.dumps(record, ensure_ascii=False).encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        order = np.lexsort((pids, terms))
+        terms, pids, tfs = terms[order], pids[order], tfs[order]
+        unique_terms, starts = np.unique(terms, return_index=True)
+        _save_array(os.path.join(path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+        _save_array(os.path.join(path, "lengths.npy"), np.asarray(lengths, dtype=np.float32))
+        _save_array(os.path.join(path, "terms.npy"), unique_terms.astype(np.uint64))
+        _save_array(os.path.join(path, "term_offsets.npy"), np.append(starts, len(terms)).astype(np.int64))
+        _save_array(os.path.join(path, "pids.npy"), pids.astype(np.int32))
+        _save_array(os.path.join(path, "tfs.npy"), tfs.astype(np.float32))
+        if vectors is not None:
+            _save_array(os.path.join(path, "vectors.npy"), np.asarray(vectors, dtype=np.float32))
+
+
+class KnowledgeBase:
+    """Passages of ingested documents with a BM25 index and optional dense vectors.
+
+    The index is a list of immutable segments plus a manifest mapping each
+    document (by path, with its mtime, size and SHA-256) to the passage range
+    it occupies in one segment. Ingest only reads and tokenizes files that
+    are new or changed, writes them as a new segment and atomically replaces
+    the manifest; passages of replaced or removed documents simply stop being
+    live. When there are more than KB_MAX_SEGMENTS segments they are merged
+    from their posting arrays, without re-tokenizing. Other processes pick up
+    a new manifest on their next search. Writers in any process (app
+    replicas, the CLI) take an exclusive lock on a file in the directory.
+    """
+
+    def __init__(self, directory, dense=KB_DENSE, dims=KB_DENSE_DIMS):
+        self.directory = directory
+        self.dense = dense
+        self.dims = dims
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._manifest = {"documents": {}, "segments": []}
+        self._segments = {}
+        # ((segment, live passage mask) pairs, live passage count, average live passage length), replaced as a whole
+        self._view = ([], 0, 1.0)
+        self._manifest_mtime = None
+        self._refresh()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    @property
+    def segments_dir(self):
+        return os.path.join(self.directory, "segments")
+
+    @property
+    def documents_dir(self):
+        """Where files uploaded through the app are kept"""
+        return os.path.join(self.directory, "documents")
+
+    @property
+    def version(self):
+        """Identifies the indexed content; changes whenever documents are added, changed or removed"""
+        self._refresh()
+        documents = self._manifest["documents"]
+        if not documents:
+            return "empty"
+        return hash_payload(sorted((path, doc["sha256"]) for path, doc in documents.items()))[:16]
+
+    def _refresh(self, force=False):
+        """Reload the manifest (and open new segments) if another writer replaced it"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime and not force:
+            return
+        with self._lock:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            self._activate(manifest)
+            self._manifest_mtime = mtime
+
+    def _activate(self, manifest):
+        """Open the manifest's segments and mark which of their passages are live"""
+        segments, live = {}, {}
+        for segment_id in manifest["segments"]:
+            segments[segment_id] = self._segments.get(segment_id) or Segment(os.path.join(self.segments_dir, segment_id))
+            live[segment_id] = np.zeros(len(segments[segment_id]), dtype=bool)
+        for doc in manifest["documents"].values():
+            live[doc["segment"]][doc["start"]:doc["stop"]] = True
+        view = [(segments[segment_id], live[segment_id]) for segment_id in manifest["segments"]]
+        # BM25 corpus statistics, computed once per manifest rather than per query
+        count = sum(int(mask.sum()) for _, mask in view)
+        total = sum(float(np.asarray(segment.lengths)[mask].sum()) for segment, mask in view)
+        avgdl = max(total / count, 1.0) if count else 1.0
+        # Searches in flight keep using the previous view; unused segments close when released
+        self._segments = segments
+        self._view = (view, count, avgdl)
+        self._manifest = manifest
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the writer lock and yield a copy of the latest manifest to modify and commit"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._write_lock, open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another process may have committed since this one last looked
+                self._refresh(force=True)
+                with self._lock:
+                    yield json.loads(json.dumps(self._manifest))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _commit(self, manifest):
+        """Atomically publish a new manifest and delete segments it no longer uses.
+
+        Must be called inside _exclusive().
+        """
+        try:
+            previous_commit = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            previous_commit = 0
+        used = {doc["segment"] for doc in manifest["documents"].values()}
+        manifest["segments"] = [segment_id for segment_id in manifest["segments"] if segment_id in used]
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        self._activate(manifest)
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+        # Readers in other processes keep their open mmaps of deleted files valid. Only
+        # segments written before the previous commit are collected, never one a writer
+        # outside the lock may still be about to commit
+        if os.path.isdir(self.segments_dir):
+            for segment_id in os.listdir(self.segments_dir):
+                path = os.path.join(self.segments_dir, segment_id)
+                if segment_id not in manifest["segments"] and os.stat(path).st_mtime_ns < previous_commit:
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def _new_segment(self, documents):
+        """Tokenize {path: {"title", "passages"}} into a new segment; returns (id, {path: (start, stop)})"""
+        records, lengths, vectors, ranges = [], [], [], {}
+        terms, pids, tfs = [], [], []
+        for path, document in documents.items():
+            start = len(records)
+            for text in document["passages"]:
+                pid = len(records)
+                tokens = tokenize(text)
+                records.append({"doc": path, "title": document["title"], "text": text})
+                lengths.append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                terms.append(term_hashes(list(counts)))
+                pids.append(np.full(len(counts), pid, dtype=np.int32))
+                tfs.append(np.array(list(counts.values()), dtype=np.float32))
+                if self.dense:
+                    vectors.append(hashed_vector(tokens, self.dims))
+            ranges[path] = (start, len(records))
+        segment_id = uuid.uuid4().hex
+        Segment.write(
+            os.path.join(self.segments_dir, segment_id),
+            records,
+            lengths,
+            np.concatenate(terms) if terms else np.zeros(0, dtype=np.uint64),
+            np.concatenate(pids) if pids else np.zeros(0, dtype=np.int32),
+            np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.float32),
+            np.stack(vectors) if vectors else None
+        )
+        return segment_id, ranges
+
+    def _compact(self, manifest):
+        """Merge all segments into one from their stored postings and vectors"""
+        records, lengths, vectors = [], [], []
+        terms, pids, tfs = [], [], []
+        documents = {}
+        for segment_id in manifest["segments"]:
+            segment = self._segments[segment_id]
+            remap = np.full(len(segment), -1, dtype=np.int64)
+            for path, doc in manifest["documents"].items():
+                if doc["segment"] != segment_id:
+                    continue
+                start = len(records)
+                for pid in range(doc["start"], doc["stop"]):
+                    remap[pid] = len(records)
+                    records.append(segment.raw_record(pid))
+                lengths.append(np.asarray(segment.lengths[doc["start"]:doc["stop"]]))
+                if self.dense and segment.vectors is not None:
+                    vectors.append(np.asarray(segment.vectors[doc["start"]:doc["stop"]]))
+                documents[path] = dict(doc, start=start, stop=len(records))
+            segment_terms, segment_pids, segment_tfs = segment.expanded_postings()
+            keep = remap[segment_pids] >= 0
+            terms.append(segment_terms[keep])
+            pids.append(remap[segment_pids[keep]])
+            tfs.append(segment_tfs[keep])
+        segment_id = uuid.uuid4().hex
+        Segment.write(
+            os.path.join(self.segments_dir, segment_id),
+            records,
+            np.concatenate(lengths) if lengths else [],
+            np.concatenate(terms), np.concatenate(pids), np.concatenate(tfs),
+            np.concatenate(vectors) if vectors and len(vectors) == len(documents) else None
+        )
+        for doc in documents.values():
+            doc["segment"] = segment_id
+        return {"documents": documents, "segments": [segment_id]}
+
+    def ingest(self, paths, on_progress=None):
+        """Index new and changed files under paths; returns the number of documents (re)indexed.
+
+        Files whose mtime and size match the manifest are skipped without
+        being read; files whose content hash is unchanged only have their
+        mtime updated.
+        """
+        self._refresh()
+        files = collect_files(paths)
+        known_documents = self._manifest["documents"]
+        changed, touched = {}, {}
+        # Files are read and split outside the writer lock
+        for done, path in enumerate(files, 1):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            known = known_documents.get(path)
+            if not (known and known["mtime"] == stat.st_mtime_ns and known["size"] == stat.st_size):
+                digest = _file_digest(path)
+                if known and known["sha256"] == digest:
+                    touched[path] = (digest, stat.st_mtime_ns, stat.st_size)
+                else:
+                    changed[path] = {
+                        "title": os.path.basename(path),
+                        "passages": split_passages(read_document(path)),
+                        "mtime": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                        "sha256": digest,
+                    }
+            if on_progress is not None:
+                on_progress(done, len(files))
+
+        with self._exclusive() as manifest:
+            for path, (digest, mtime, size) in touched.items():
+                doc = manifest["documents"].get(path)
+                if doc is not None and doc["sha256"] == digest:
+                    doc.update(mtime=mtime, size=size)
+            if changed:
+                segment_id, ranges = self._new_segment(changed)
+                manifest["segments"].append(segment_id)
+                for path, document in changed.items():
+                    start, stop = ranges[path]
+                    manifest["documents"][path] = {
+                        "title": document["title"], "mtime": document["mtime"], "size": document["size"],
+                        "sha256": document["sha256"], "segment": segment_id, "start": start, "stop": stop,
+                    }
+                self._commit(manifest)
+                if len(self._manifest["segments"]) > KB_MAX_SEGMENTS:
+                    self._commit(self._compact(self._manifest))
+            elif manifest != self._manifest:
+                self._commit(manifest)
+        return len(changed)
+
+    def remove(self, path):
+        """Drop a document from the index"""
+        with self._exclusive() as manifest:
+            if manifest["documents"].pop(os.path.abspath(path), None) is not None:
+                self._commit(manifest)
+
+    def documents(self):
+        """(path, title, passage count) of every indexed document"""
+        self._refresh()
+        return [
+            (path, doc["title"], doc["stop"] - doc["start"])
+            for path, doc in sorted(self._manifest["documents"].items())
+        ]
+
+    def search(self, query, k=5):
+        """Top-k passages for query as dicts with doc, title, text and score.
+
+        Candidates are live passages sharing at least one term with the
+        query, scored by BM25 with corpus statistics over all segments;
+        with dense vectors the score blends in the cosine similarity of
+        the hashed vectors.
+        """
+        self._refresh()
+        view, count, avgdl = self._view
+        if not count:
+            return []
+        tokens = tokenize(query)
+
+        # Document frequencies across segments, counting live passages only
+        postings = {}
+        df = {}
+        unique_tokens = sorted(set(tokens))
+        for token, term_hash in zip(unique_tokens, term_hashes(unique_tokens)):
+            for segment, live in view:
+                found = segment.postings(term_hash)
+                if found is None:
+                    continue
+                pids, tfs = found
+                keep = live[pids]
+                if keep.any():
+                    postings.setdefault(segment.id, []).append((token, np.asarray(pids)[keep], np.asarray(tfs)[keep]))
+                    df[token] = df.get(token, 0) + int(keep.sum())
+
+        query_vector = hashed_vector(tokens, self.dims) if self.dense else None
+        hits = []
+        for segment, _ in view:
+            if segment.id not in postings:
+                continue
+            # Scores are accumulated over the posting passages only, never the whole segment
+            all_pids, contributions = [], []
+            for token, pids, tfs in postings[segment.id]:
+                idf = math.log(1 + (count - df[token] + 0.5) / (df[token] + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(segment.lengths[pids]) / avgdl)
+                all_pids.append(pids)
+                contributions.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+            candidates, positions = np.unique(np.concatenate(all_pids), return_inverse=True)
+            scores = np.bincount(positions, weights=np.concatenate(contributions)).astype(np.float32)
+            positive = scores > 0
+            candidates, scores = candidates[positive], scores[positive]
+            cosine = None
+            if query_vector is not None and segment.vectors is not None:
+                cosine = np.clip(np.asarray(segment.vectors[candidates]) @ query_vector, 0, None)
+            hits.append((segment, candidates, scores, cosine))
+        if not hits:
+            return []
+
+        top = max(float(scores.max()) for _, _, scores, _ in hits)
+        ranked = []
+        for segment, candidates, scores, cosine in hits:
+            blended = scores / top
+            if cosine is not None:
+                blended = (1 - KB_DENSE_WEIGHT) * blended + KB_DENSE_WEIGHT * cosine
+            for pid, score in zip(candidates, blended):
+                ranked.append((float(score), segment, int(pid)))
+        ranked.sort(key=lambda hit: -hit[0])
+        return [dict(segment.record(pid), score=score) for score, segment, pid in ranked[:k]]
+
+
+def requirement_items(requirements):
+    """Flatten a (partial) requirements dict into individual requirement strings"""
+    items = []
+
+    def walk(value, label):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(item, str(key).replace("_", " "))
+        elif isinstance(value, list):
+            for item in value:
+                walk(item, label)
+        elif value not in (None, ""):
+            items.append(f"{label}: {value}" if label else str(value))
+
+    walk(requirements, "")
+    return items
+
+
+def retrieve_for_requirements(kb, requirements, k=None, max_passages=None):
+    """Best passages across all requirement items, deduplicated, best first"""
+    best = {}
+    for item in requirement_items(requirements):
+        for hit in kb.search(item, k=k or KB_TOP_K):
+            key = (hit["doc"], hit["text"])
+            if key not in best or hit["score"] > best[key]["score"]:
+                best[key] = hit
+    return sorted(best.values(), key=lambda hit: -hit["score"])[:max_passages or KB_MAX_PASSAGES]
+
+
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base():
+    """Return the process-wide knowledge base"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                _knowledge_base = KnowledgeBase(KB_DIR)
+    return _knowledge_base
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local knowledge base")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="index DOCX/PDF/MD files and directories")
+    ingest.add_argument("paths", nargs="+")
+    search = commands.add_parser("search", help="show the best passages for a query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    commands.add_parser("list", help="list indexed documents")
+    args = parser.parse_args(argv)
+
+    kb = get_knowledge_base()
+    if args.command == "ingest":
+        count = kb.ingest(args.paths, on_progress=lambda done, total: print(f"{done}/{total}", file=sys.stderr))
+        print(f"Ingested {count} documents; {sum(n for _, _, n in kb.documents())} passages indexed")
+    elif args.command == "search":
+        for hit in kb.search(args.query, k=args.k):
+            print(f"[{hit['score']:.3f}] {hit['title']}: {hit['text'][:200]}")
+    else:
+        for path, title, passages in kb.documents():
+            print(f"{passages:5d}  {title}  ({path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""Shared HTTP client layer for the Anthropic Messages API.
+
+Streamlit re-executes app.py on every rerun but keeps imported modules in
+memory, so the pooled session defined here is created once per server process
+and reused by every rerun and every user session.
+"""
+import json
+import os
+import threading
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from cache import CACHE_DIR, SqliteCache, hash_payload
+from prompts import count_tokens
+from rate_limit import RequestScheduler, call_with_retries
+from semantic_cache import SemanticCache
+from text_index import literals, normalize_text
+
+# Load environment variables from .env file before reading client settings
+load_dotenv()
+
+ANTHROPIC_VERSION = "2023-06-01"
+DEFAULT_MODEL = "claude-3-haiku-20240307"  # Claude 3 Haiku is fast and reliable
+
+# Shortest prompt prefix, in tokens, the API caches for a model family; shorter breakpoints are ignored
+MIN_CACHEABLE_TOKENS = {"haiku": 2048}
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+
+# Connection pool settings, overridable through environment variables
+# base_url can point at a proxy or at the local stub server (see stub_server.py)
+CLIENT_CONFIG = {
+    "base_url": os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/"),
+    "pool_connections": int(os.getenv("ANTHROPIC_POOL_CONNECTIONS", "4")),
+    "pool_maxsize": int(os.getenv("ANTHROPIC_POOL_MAXSIZE", "16")),
+    "connect_timeout": float(os.getenv("ANTHROPIC_CONNECT_TIMEOUT", "10")),
+    "read_timeout": float(os.getenv("ANTHROPIC_READ_TIMEOUT", "120")),
+    "keep_alive": os.getenv("ANTHROPIC_KEEP_ALIVE", "1") != "0",
+}
+
+# Response cache settings; identical payloads return the stored completion
+RESPONSE_CACHE_CONFIG = {
+    "enabled": os.getenv("ANTHROPIC_RESPONSE_CACHE", "1") != "0",
+    "path": os.getenv("ANTHROPIC_RESPONSE_CACHE_PATH", os.path.join(CACHE_DIR, "llm_responses.sqlite")),
+    "max_entries": int(os.getenv("ANTHROPIC_RESPONSE_CACHE_MAX_ENTRIES", "2000")),
+    "max_bytes": int(os.getenv("ANTHROPIC_RESPONSE_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+    "ttl": float(os.getenv("ANTHROPIC_RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+}
+
+# Semantic cache settings; off by default. Only calls that opt in (knowledge lookups) are served near-identical prompts
+SEMANTIC_CACHE_CONFIG = {
+    "enabled": os.getenv("ANTHROPIC_SEMANTIC_CACHE", "0") != "0",
+    "path": os.getenv("ANTHROPIC_SEMANTIC_CACHE_PATH", os.path.join(CACHE_DIR, "llm_semantic.sqlite")),
+    "threshold": float(os.getenv("ANTHROPIC_SEMANTIC_CACHE_THRESHOLD", "0.95")),
+    "max_entries": int(os.getenv("ANTHROPIC_SEMANTIC_CACHE_MAX_ENTRIES", "2000")),
+    "ttl": float(os.getenv("ANTHROPIC_SEMANTIC_CACHE_TTL", str(7 * 24 * 3600))),
+}
+
+# Client-side limits, kept at or just under the account's API rate limits
+RATE_LIMIT_CONFIG = {
+    "requests_per_minute": float(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "50")),
+    "input_tokens_per_minute": float(os.getenv("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", "50000")),
+}
+
+# Retry policy for throttled (429/529) and transient failures
+RETRY_CONFIG = {
+    "max_retries": int(os.getenv("ANTHROPIC_MAX_RETRIES", "5")),
+    "base_delay": float(os.getenv("ANTHROPIC_RETRY_BASE_DELAY", "1")),
+    "max_delay": float(os.getenv("ANTHROPIC_RETRY_MAX_DELAY", "60")),
+}
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+_session = None
+_session_lock = threading.Lock()
+_response_cache = None
+_semantic_cache = None
+_scheduler = None
+
+
+class AnthropicAPIError(Exception):
+    """Non-200 response from the Messages API"""
+
+    def __init__(self, status_code, body, retry_after=None):
+        super().__init__(f"Error from Anthropic API: {body}")
+        self.status_code = status_code
+        self.body = body
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status_code in RETRYABLE_STATUS_CODES
+
+
+def _build_session():
+    """Create a requests Session with a sized connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=CLIENT_CONFIG["pool_connections"],
+        pool_maxsize=CLIENT_CONFIG["pool_maxsize"],
+        pool_block=False,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not CLIENT_CONFIG["keep_alive"]:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def configure(**options):
+    """Update pool/timeout settings and rebuild the shared session.
+
+    Accepts any key of CLIENT_CONFIG, e.g. configure(pool_maxsize=32) or
+    configure(base_url="http://127.0.0.1:8765").
+    """
+    global _session
+    unknown = set(options) - set(CLIENT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown client options: {', '.join(sorted(unknown))}")
+    with _session_lock:
+        CLIENT_CONFIG.update(options)
+        old_session, _session = _session, None
+    if old_session is not None:
+        old_session.close()
+
+
+def get_scheduler():
+    """Return the process-wide request scheduler shared by all sessions"""
+    global _scheduler
+    if _scheduler is None:
+        with _session_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler(
+                    RATE_LIMIT_CONFIG["requests_per_minute"],
+                    RATE_LIMIT_CONFIG["input_tokens_per_minute"]
+                )
+    return _scheduler
+
+
+def get_response_cache():
+    """Return the shared response cache, or None when caching is disabled"""
+    global _response_cache
+    if not RESPONSE_CACHE_CONFIG["enabled"]:
+        return None
+    if _response_cache is None:
+        with _session_lock:
+            if _response_cache is None:
+                _response_cache = SqliteCache(
+                    RESPONSE_CACHE_CONFIG["path"],
+                    max_entries=RESPONSE_CACHE_CONFIG["max_entries"],
+                    max_bytes=RESPONSE_CACHE_CONFIG["max_bytes"],
+                    ttl=RESPONSE_CACHE_CONFIG["ttl"]
+                )
+    return _response_cache
+
+
+def get_semantic_cache():
+    """Return the shared semantic cache, or None when it is disabled"""
+    global _semantic_cache
+    if not SEMANTIC_CACHE_CONFIG["enabled"]:
+        return None
+    if _semantic_cache is None:
+        with _session_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    SEMANTIC_CACHE_CONFIG["path"],
+                    threshold=SEMANTIC_CACHE_CONFIG["threshold"],
+                    max_entries=SEMANTIC_CACHE_CONFIG["max_entries"],
+                    ttl=SEMANTIC_CACHE_CONFIG["ttl"]
+                )
+    return _semantic_cache
+
+
+def cache_stats():
+    """Return hit/miss counters and size of the response cache, and those of the semantic cache"""
+    cache = get_response_cache()
+    stats = cache.stats() if cache is not None else {"entries": 0, "bytes": 0, "hits": 0, "misses": 0}
+    semantic = get_semantic_cache()
+    stats["semantic"] = semantic.stats() if semantic is not None else {"entries": 0, "hits": 0, "misses": 0}
+    return stats
+
+
+class UsageTracker:
+    """Thread-safe running totals of the token usage reported by the API"""
+
+    FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+
+    def record(self, usage):
+        with self._lock:
+            self.calls += 1
+            for field in self.FIELDS:
+                self.totals[field] += usage.get(field) or 0
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.totals, calls=self.calls)
+
+
+# Process-wide usage across all sessions; callers may also pass their own tracker
+usage_totals = UsageTracker()
+
+
+def _record_usage(response_json, usage):
+    reported = response_json.get("usage") or {}
+    usage_totals.record(reported)
+    if usage is not None:
+        usage.record(reported)
+
+
+def text_block(text, cache=False):
+    """A text content block, optionally marked as a prompt-cache breakpoint.
+
+    Everything up to and including a cached block is reused by later requests
+    that send the same prefix (tools, then system, then messages).
+    """
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def min_cacheable_tokens(model=DEFAULT_MODEL):
+    """Minimum length of a prefix the API will write to the prompt cache for model"""
+    for family, tokens in MIN_CACHEABLE_TOKENS.items():
+        if family in model:
+            return tokens
+    return DEFAULT_MIN_CACHEABLE_TOKENS
+
+
+def build_request(prompt, max_tokens=2000, temperature=0, system_prompt=None, model=DEFAULT_MODEL):
+    """Build the Messages API payload for a single-turn prompt.
+
+    prompt and system_prompt may each be a string or a list of content
+    blocks (see text_block) carrying cache_control breakpoints.
+    """
+    data = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+
+    # Add system prompt if provided
+    if system_prompt:
+        data["system"] = system_prompt
+    return data
+
+
+def _headers(api_key):
+    return {
+        "x-api-key": api_key,
+        "content-type": "application/json",
+        "anthropic-version": ANTHROPIC_VERSION
+    }
+
+
+def _retry_after(response):
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _is_retryable(error):
+    if isinstance(error, AnthropicAPIError):
+        return error.retryable
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def messages_url():
+    return CLIENT_CONFIG["base_url"].rstrip("/") + "/v1/messages"
+
+
+def _on_throttle(error, delay):
+    # A 429 means the shared account limit is exhausted: hold every session, not just this call
+    if isinstance(error, AnthropicAPIError) and error.status_code == 429:
+        get_scheduler().pause(delay)
+
+
+def estimate_input_tokens(data):
+    """Approximate input tokens of a payload, for the tokens-per-minute limiter"""
+    return count_tokens(json.dumps([data.get("system"), data["messages"]], ensure_ascii=False))
+
+
+def send_request(api_key, data, stream=False, client_id="default"):
+    """POST a payload through the scheduler with retries; returns the 200 response.
+
+    Each attempt waits for the rate limiter (served fairly across client_id
+    values) and retryable failures back off exponentially with jitter,
+    honouring retry-after. Other failures raise AnthropicAPIError.
+    """
+    def attempt():
+        get_scheduler().acquire(client_id, estimate_input_tokens(data))
+        response = get_session().post(
+            messages_url(),
+            headers=_headers(api_key),
+            json=dict(data, stream=True) if stream else data,
+            timeout=(CLIENT_CONFIG["connect_timeout"], CLIENT_CONFIG["read_timeout"]),
+            stream=stream
+        )
+        if response.status_code != 200:
+            body = response.text
+            response.close()
+            raise AnthropicAPIError(response.status_code, body, _retry_after(response))
+        return response
+
+    return call_with_retries(
+        attempt,
+        _is_retryable,
+        lambda error: getattr(error, "retry_after", None),
+        RETRY_CONFIG["max_retries"],
+        RETRY_CONFIG["base_delay"],
+        RETRY_CONFIG["max_delay"],
+        on_throttle=_on_throttle
+    )
+
+
+def post_messages(api_key, data, client_id="default"):
+    """POST a payload to the Messages API over the pooled session and return the JSON body"""
+    return send_request(api_key, data, client_id=client_id).json()
+
+
+def _block_texts(content):
+    if isinstance(content, str):
+        return [content]
+    return [block.get("text", "") for block in content or []]
+
+
+def semantic_key(data):
+    """(scope, text) under which a payload is stored in the semantic cache.
+
+    The scope must match exactly: model, sampling settings, the whole system
+    prompt (instructions and the shared RFP context alike), the prompt's
+    first line, which states the task, and every number, date, time or
+    identifier in the prompt. Only the wording of the rest of the prompt is
+    compared by similarity, so a changed deadline, amount or clause number
+    is always a miss.
+    """
+    system = _block_texts(data.get("system"))
+    prompt = "\n".join(_block_texts(data["messages"][-1]["content"]))
+    task = next((line for line in prompt.splitlines() if line.strip()), "")
+    scope = hash_payload({
+        "model": data["model"],
+        "max_tokens": data["max_tokens"],
+        "temperature": data["temperature"],
+        "system": [normalize_text(text) for text in system],
+        "task": normalize_text(task),
+        "literals": literals(prompt),
+    })
+    return scope, prompt
+
+
+def _cache_lookup(data, use_cache, semantic_cache=False):
+    """Stored response for a payload from the exact cache, else (if asked) the semantic cache, or None"""
+    if not use_cache:
+        return None
+    cache = get_response_cache()
+    if cache is not None:
+        cached = cache.get(hash_payload(data))
+        if cached is not None:
+            return json.loads(cached)
+    semantic = get_semantic_cache() if semantic_cache else None
+    if semantic is not None:
+        found = semantic.get(*semantic_key(data))
+        if found is not None:
+            return json.loads(found[0])
+    return None
+
+
+def _cache_store(data, response_json, use_cache, semantic_cache=False):
+    if not use_cache:
+        return
+    value = json.dumps(response_json).encode("utf-8")
+    cache = get_response_cache()
+    if cache is not None:
+        cache.set(hash_payload(data), value)
+    semantic = get_semantic_cache() if semantic_cache else None
+    if semantic is not None:
+        semantic.set(*semantic_key(data), value)
+
+
+def cached_post_messages(api_key, data, use_cache=True, usage=None, client_id="default", semantic_cache=False):
+    """post_messages() behind the response caches.
+
+    The exact cache is keyed by a hash of the full request payload, so any
+    change to model, prompt, system prompt, temperature or max_tokens is a
+    different entry. With semantic_cache, a miss is served the completion of
+    a near-identical earlier prompt (see semantic_key); only pass it for
+    lookups whose answer does not depend on the exact wording, never for
+    extraction or drafting. Token usage of
+    requests that reach the API is recorded in usage_totals and, if given,
+    the usage tracker.
+    """
+    cached = _cache_lookup(data, use_cache, semantic_cache)
+    if cached is not None:
+        return cached
+
+    response_json = post_messages(api_key, data, client_id=client_id)
+    _record_usage(response_json, usage)
+    _cache_store(data, response_json, use_cache, semantic_cache)
+    return response_json
+
+
+def create_message(api_key, prompt, max_tokens=2000, temperature=0, system_prompt=None, model=DEFAULT_MODEL, use_cache=True, usage=None, client_id="default", semantic_cache=False):
+    """Send a single-turn prompt and return the text of the first content block"""
+    data = build_request(prompt, max_tokens, temperature, system_prompt, model)
+    response_json = cached_post_messages(api_key, data, use_cache=use_cache, usage=usage, client_id=client_id, semantic_cache=semantic_cache)
+    return response_json["content"][0]["text"]
+
+
+def _iter_sse_events(response):
+    """Yield (event, data) pairs from a server-sent events response"""
+    event, data_lines = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+    if data_lines:
+        yield event, json.loads("\n".join(data_lines))
+
+
+def stream_messages(api_key, data, client_id="default"):
+    """Stream a Messages API request, yielding text deltas as they arrive.
+
+    The generator's return value (StopIteration.value) is the assembled
+    response body in the same shape post_messages() returns. Failures before
+    the stream starts are retried like blocking calls; an error event in the
+    middle of a stream, or a stream that ends without message_stop (a
+    connection closed early), raises AnthropicAPIError, so a truncated reply
+    is never returned or cached.
+    """
+    response = send_request(api_key, data, stream=True, client_id=client_id)
+
+    with response:
+        message = {"content": [], "usage": {}}
+        parts = []
+        stopped = False
+        for event, payload in _iter_sse_events(response):
+            event = event or payload.get("type")
+            if event == "message_start":
+                message.update({k: v for k, v in payload["message"].items() if k != "content"})
+                message["usage"] = dict(payload["message"].get("usage", {}))
+            elif event == "content_block_delta" and payload["delta"].get("type") == "text_delta":
+                parts.append(payload["delta"]["text"])
+                yield payload["delta"]["text"]
+            elif event == "message_delta":
+                message.update(payload.get("delta", {}))
+                message["usage"].update(payload.get("usage", {}))
+            elif event == "message_stop":
+                stopped = True
+            elif event == "error":
+                raise AnthropicAPIError(response.status_code, json.dumps(payload))
+
+    if not stopped:
+        raise AnthropicAPIError(response.status_code, json.dumps({
+            "type": "error", "error": {"type": "incomplete_stream", "message": "stream ended before message_stop"}
+        }))
+    message["content"] = [{"type": "text", "text": "".join(parts)}]
+    return message
+
+
+def stream_message(api_key, prompt, max_tokens=2000, temperature=0, system_prompt=None, model=DEFAULT_MODEL, use_cache=True, usage=None, client_id="default", semantic_cache=False):
+    """Streaming counterpart of create_message(); yields text chunks.
+
+    A cache hit yields the stored completion as a single chunk. A completed
+    stream is written to the response caches like a blocking call.
+    """
+    data = build_request(prompt, max_tokens, temperature, system_prompt, model)
+    cached = _cache_lookup(data, use_cache, semantic_cache)
+    if cached is not None:
+        yield cached["content"][0]["text"]
+        return
+
+    response_json = yield from stream_messages(api_key, data, client_id=client_id)
+    _record_usage(response_json, usage)
+    _cache_store(data, response_json, use_cache, semantic_cache)
@@ -0,0 +1,129 @@
+"""PDF text extraction straight from in-memory bytes.
+
+Large documents are split into page batches and extracted in a process pool;
+each worker opens the PDF once and extracts the batches it is handed. Page
+texts are collected in a list and joined once, and progress is reported per
+page as batches complete. Extracted pages are cached on disk by the SHA-256
+of the PDF bytes, so a repeat upload skips parsing entirely.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyPDF2 import PdfReader
+
+from cache import CACHE_DIR, SqliteCache
+
+# Documents shorter than this are extracted in-process; spawning workers costs more than it saves
+PARALLEL_MIN_PAGES = int(os.getenv("RFP_PDF_PARALLEL_MIN_PAGES", "64"))
+BATCH_SIZE = int(os.getenv("RFP_PDF_BATCH_SIZE", "8"))
+MAX_WORKERS = int(os.getenv("RFP_PDF_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Extracted-text cache, bounded by total compressed size
+TEXT_CACHE_PATH = os.getenv("RFP_TEXT_CACHE_PATH", os.path.join(CACHE_DIR, "pdf_text.sqlite"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("RFP_TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TEXT_CACHE_MAX_ENTRIES = int(os.getenv("RFP_TEXT_CACHE_MAX_ENTRIES", "500"))
+
+_worker_reader = None
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+
+def _init_worker(pdf_bytes):
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(pdf_bytes))
+
+
+def _extract_batch(start, stop):
+    return start, [_worker_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pages(pdf_bytes, workers=None, batch_size=None):
+    """Yield (page_index, text, page_count) for every page, in completion order"""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+    workers = workers or MAX_WORKERS
+    batch_size = batch_size or BATCH_SIZE
+
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        for index, page in enumerate(reader.pages):
+            yield index, page.extract_text() or "", page_count
+        return
+
+    # Spawned workers avoid forking the threads of a running Streamlit server
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(pdf_bytes,)
+    ) as pool:
+        futures = [
+            pool.submit(_extract_batch, start, min(start + batch_size, page_count))
+            for start in range(0, page_count, batch_size)
+        ]
+        for future in as_completed(futures):
+            start, texts = future.result()
+            for offset, text in enumerate(texts):
+                yield start + offset, text, page_count
+
+
+def extract_pages(pdf_bytes, workers=None, on_progress=None):
+    """Return the list of page texts; on_progress(done, total) is called per page"""
+    pages = None
+    done = 0
+    for index, text, page_count in iter_pages(pdf_bytes, workers=workers):
+        if pages is None:
+            pages = [""] * page_count
+        pages[index] = text
+        done += 1
+        if on_progress is not None:
+            on_progress(done, page_count)
+    return pages or []
+
+
+def join_pages(pages):
+    """Join page texts into the single document string the agents consume"""
+    return "\n".join(pages)
+
+
+def pdf_digest(pdf_bytes):
+    """SHA-256 hex digest identifying a PDF by its content"""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def get_text_cache():
+    global _text_cache
+    if _text_cache is None:
+        with _text_cache_lock:
+            if _text_cache is None:
+                _text_cache = SqliteCache(
+                    TEXT_CACHE_PATH,
+                    max_entries=TEXT_CACHE_MAX_ENTRIES,
+                    max_bytes=TEXT_CACHE_MAX_BYTES
+                )
+    return _text_cache
+
+
+def extract_pages_cached(pdf_bytes, workers=None, on_progress=None):
+    """extract_pages() backed by the content-addressed text cache.
+
+    Returns (pages, cache_hit). On a hit on_progress is called once with the
+    final page count.
+    """
+    cache = get_text_cache()
+    key = pdf_digest(pdf_bytes)
+    cached = cache.get(key)
+    if cached is not None:
+        pages = json.loads(zlib.decompress(cached).decode("utf-8"))
+        if on_progress is not None and pages:
+            on_progress(len(pages), len(pages))
+        return pages, True
+
+    pages = extract_pages(pdf_bytes, workers=workers, on_progress=on_progress)
+    cache.set(key, zlib.compress(json.dumps(pages).encode("utf-8")))
+    return pages, False
@@ -0,0 +1,187 @@
+"""Minimal asyncio executor for a dependency graph of agent steps.
+
+Each Node names the context keys it reads and the keys it produces. A node
+starts as soon as all of its inputs are available, so independent nodes run
+concurrently and total wall-clock time follows the critical path.
+"""
+import asyncio
+import functools
+import inspect
+import time
+
+from cache import hash_payload
+
+
+class PipelineError(Exception):
+    """Raised when the graph is invalid or a node fails"""
+
+    def __init__(self, message, node=None):
+        super().__init__(message)
+        self.node = node
+
+
+class Node:
+    """One step of a pipeline.
+
+    func is called with the node's inputs as keyword arguments. With a single
+    output its return value is stored under that key; with several outputs it
+    must return a dict containing each of them. Plain functions run in an
+    executor thread, coroutine functions run on the event loop. If func
+    accepts a `progress` argument it receives a progress(done, total)
+    callback, which may be called from any thread. Bump version when the
+    node's behaviour changes so memoized outputs are recomputed.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=None, version="1"):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) if outputs is not None else (name,)
+        self.version = version
+        try:
+            self.reports_progress = "progress" in inspect.signature(func).parameters
+        except (TypeError, ValueError):
+            self.reports_progress = False
+
+    def __repr__(self):
+        return f"Node({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+class Pipeline:
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self._producers = {}
+        for node in self.nodes:
+            for key in node.outputs:
+                if key in self._producers:
+                    raise PipelineError(f"Output '{key}' is produced by both '{self._producers[key].name}' and '{node.name}'")
+                self._producers[key] = node
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(node):
+            if node.name in done:
+                return
+            if node.name in visiting:
+                raise PipelineError(f"Dependency cycle through '{node.name}'", node.name)
+            visiting.add(node.name)
+            for key in node.inputs:
+                if key in self._producers:
+                    visit(self._producers[key])
+            visiting.discard(node.name)
+            done.add(node.name)
+
+        for node in self.nodes:
+            visit(node)
+
+    def fingerprint(self, node, kwargs):
+        """Hash identifying a node's behaviour and input values"""
+        return hash_payload({"node": node.name, "version": node.version, "inputs": kwargs})
+
+    def _check_inputs(self, context):
+        for node in self.nodes:
+            for key in node.inputs:
+                if key not in context and key not in self._producers:
+                    raise PipelineError(f"Input '{key}' of node '{node.name}' is not provided", node.name)
+
+    async def run_async(self, context=None, executor=None, on_event=None, memo=None, force=()):
+        """Run every node and return (context, timings).
+
+        Nodes whose outputs are already present in context are skipped. With
+        a memo (an object with get(name) -> (fingerprint, outputs) or None and
+        put(name, fingerprint, outputs)), a node whose input fingerprint
+        matches its memoized one reuses the stored outputs instead of running,
+        so only nodes downstream of a changed input are recomputed. Nodes
+        named in force always run.
+
+        timings maps node name to start/end/duration in seconds relative to the
+        start of the run. on_event, if given, is called on the event loop thread
+        with a dict for each node "start", "progress" (with done, total and
+        percent), "end" (with the node's outputs and whether they came from
+        the memo) and "error".
+        """
+        context = dict(context or {})
+        self._check_inputs(context)
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in self._producers}
+        for key, value in context.items():
+            if key in futures:
+                futures[key].set_result(value)
+        timings = {}
+        started = time.perf_counter()
+
+        def emit(event, node, **extra):
+            if on_event is not None:
+                on_event(dict(event=event, node=node.name, time=time.perf_counter() - started, **extra))
+
+        async def run_node(node):
+            kwargs = {}
+            for key in node.inputs:
+                kwargs[key] = await futures[key] if key in futures else context[key]
+
+            if node.reports_progress:
+                def progress(done, total):
+                    percent = 100.0 * done / total if total else 100.0
+                    loop.call_soon_threadsafe(
+                        functools.partial(emit, "progress", node, done=done, total=total, percent=percent)
+                    )
+                kwargs["progress"] = progress
+
+            fingerprint = remembered = None
+            if memo is not None:
+                fingerprint = self.fingerprint(node, {key: kwargs[key] for key in node.inputs})
+                if node.name not in force:
+                    remembered = memo.get(node.name)
+            cached = remembered is not None and remembered[0] == fingerprint
+
+            start = time.perf_counter() - started
+            emit("start", node)
+            try:
+                if cached:
+                    result = remembered[1]
+                elif inspect.iscoroutinefunction(node.func):
+                    result = await node.func(**kwargs)
+                else:
+                    result = await loop.run_in_executor(executor, functools.partial(node.func, **kwargs))
+            except Exception as e:
+                emit("error", node, error=str(e))
+                raise PipelineError(f"Node '{node.name}' failed: {e}", node.name) from e
+            end = time.perf_counter() - started
+            timings[node.name] = {"start": start, "end": end, "duration": end - start}
+
+            if len(node.outputs) == 1 and not cached:
+                result = {node.outputs[0]: result}
+            for key in node.outputs:
+                if key not in result:
+                    raise PipelineError(f"Node '{node.name}' did not produce '{key}'", node.name)
+                context[key] = result[key]
+                futures[key].set_result(result[key])
+            outputs = {key: result[key] for key in node.outputs}
+            if memo is not None and not cached:
+                memo.put(node.name, fingerprint, outputs)
+            emit("end", node, duration=end - start, outputs=outputs, cached=cached)
+
+        # Nodes whose outputs were supplied up front are already satisfied
+        pending = []
+        for node in self.nodes:
+            supplied = [key for key in node.outputs if key in context]
+            if not supplied:
+                pending.append(node)
+            elif len(supplied) != len(node.outputs):
+                raise PipelineError(f"Context supplies only some outputs of node '{node.name}'", node.name)
+
+        tasks = [asyncio.ensure_future(run_node(node)) for node in pending]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return context, timings
+
+    def run(self, context=None, executor=None, on_event=None, memo=None, force=()):
+        """Synchronous entry point; runs the graph on a fresh event loop"""
+        return asyncio.run(self.run_async(context, executor=executor, on_event=on_event, memo=memo, force=force))
@@ -0,0 +1,125 @@
+"""Token-budget-aware helpers for building agent prompts.
+
+Requirements are serialised as a terse outline (or minified JSON) instead of
+a Python repr, each agent only receives the requirement categories it needs,
+and every variable part of a prompt is trimmed to a configured input budget.
+Token counts are estimated locally, without a tokenizer dependency.
+"""
+import json
+import os
+import re
+
+# Average characters per token for English prose, used for fast size estimates
+CHARS_PER_TOKEN = 4
+
+# Requirement categories each agent needs, in priority order (lowest priority dropped first)
+AGENT_REQUIREMENT_KEYS = {
+    "knowledge": None,  # the caller already passes only the categories being looked up
+    # Cached context shared by the Response Generator, section drafting and Quality Control
+    "shared": ("Key_Requirements_And_Deliverables", "Compliance_Needs", "Required_Sections_For_The_Response", "Evaluation_Criteria", "Deadlines"),
+}
+
+# Input token budgets for each variable part of each agent's prompt
+INPUT_BUDGETS = {
+    "knowledge": {"requirements": 3000, "passages": 3000},
+    "shared": {"requirements": 6000},
+    "response": {"knowledge": 3000},
+    "section": {"knowledge": 2000},
+    "review": {"response_draft": 20000},
+}
+INPUT_BUDGETS.update(json.loads(os.getenv("RFP_INPUT_BUDGETS", "{}")))
+
+# Requirements serialisation: "outline" (fewest tokens) or "json" (minified)
+REQUIREMENTS_FORMAT = os.getenv("RFP_REQUIREMENTS_FORMAT", "outline")
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """Estimate the number of tokens in text.
+
+    Words and punctuation marks count as one token each, with long words
+    counted per CHARS_PER_TOKEN characters, which tracks BPE tokenizers
+    closely enough for budgeting.
+    """
+    return sum(max(1, len(piece) // CHARS_PER_TOKEN) for piece in _TOKEN_PATTERN.findall(text or ""))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to at most max_tokens, at a line boundary when possible"""
+    if max_tokens is None or count_tokens(text) <= max_tokens:
+        return text
+    marker = "\n[... truncated to fit the input budget ...]"
+    lines = text.split("\n")
+    kept, used = [], count_tokens(marker)
+    for line in lines:
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > max_tokens:
+            break
+        kept.append(line)
+        used += line_tokens
+    if not kept:
+        kept = [text[:max(0, max_tokens - count_tokens(marker)) * CHARS_PER_TOKEN]]
+    return "\n".join(kept) + marker
+
+
+def _label(key):
+    return str(key).replace("_", " ")
+
+
+def _outline(value, depth=0):
+    indent = "  " * depth
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                lines.append(f"{indent}{_label(key)}:")
+                lines.extend(_outline(item, depth + 1))
+            else:
+                lines.append(f"{indent}{_label(key)}: {item}")
+        return lines
+    if isinstance(value, list):
+        lines = []
+        for item in value:
+            if isinstance(item, (dict, list)):
+                lines.extend(_outline(item, depth))
+            else:
+                lines.append(f"{indent}- {item}")
+        return lines
+    return [f"{indent}{value}"]
+
+
+def serialize_requirements(requirements, fmt=None):
+    """Serialise a requirements dict as a terse outline or minified JSON"""
+    if (fmt or REQUIREMENTS_FORMAT) == "json":
+        return json.dumps(requirements, separators=(",", ":"), ensure_ascii=False)
+    return "\n".join(_outline(requirements))
+
+
+def select_requirements(requirements, keys):
+    """Return only the given top-level categories, in the given order"""
+    if keys is None:
+        return dict(requirements)
+    return {key: requirements[key] for key in keys if key in requirements}
+
+
+def requirements_block(requirements, agent, fmt=None):
+    """Serialise the categories an agent needs, within its requirements budget.
+
+    Whole categories are dropped from the end of the agent's priority list
+    while the block is over budget; if the first category alone is still too
+    large it is truncated.
+    """
+    selected = select_requirements(requirements or {}, AGENT_REQUIREMENT_KEYS.get(agent))
+    budget = INPUT_BUDGETS.get(agent, {}).get("requirements")
+    keys = list(selected)
+    text = serialize_requirements(selected, fmt)
+    while budget is not None and len(keys) > 1 and count_tokens(text) > budget:
+        keys.pop()
+        text = serialize_requirements({key: selected[key] for key in keys}, fmt)
+    return truncate_to_tokens(text, budget)
+
+
+def budgeted(text, agent, part):
+    """Trim a free-text prompt part (e.g. knowledge, response_draft) to its budget"""
+    return truncate_to_tokens(text or "", INPUT_BUDGETS.get(agent, {}).get(part))
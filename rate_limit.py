@@ -0,0 +1,119 @@
+"""Client-side rate limiting and retry policy for API requests.
+
+A RequestScheduler admits requests through two token buckets (requests per
+minute and input tokens per minute) and serves waiting callers round-robin by
+client id, so one user's 12 parallel section calls cannot starve another
+user's run. call_with_retries() retries throttled and transient failures with
+exponential backoff and full jitter, honouring the server's retry-after.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class TokenBucket:
+    """Refills at rate_per_minute up to capacity; not thread-safe on its own"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        self._refill(now)
+        # Requests larger than the bucket are admitted once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RequestScheduler:
+    """Fair admission control for requests sharing one API rate limit"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # client id -> deque of waiting tickets, in round-robin order
+        self._paused_until = 0.0
+
+    def _head(self):
+        for queue in self._queues.values():
+            if queue:
+                return queue[0]
+        return None
+
+    def acquire(self, client_id, tokens):
+        """Block until a request of roughly `tokens` input tokens may be sent"""
+        ticket = object()
+        with self._cond:
+            self._queues.setdefault(client_id, deque()).append(ticket)
+            try:
+                while True:
+                    if self._head() is ticket:
+                        now = time.monotonic()
+                        wait = max(
+                            self._paused_until - now,
+                            self.request_bucket.wait_time(1, now),
+                            self.token_bucket.wait_time(tokens, now)
+                        )
+                        if wait <= 0:
+                            self.request_bucket.take(1)
+                            self.token_bucket.take(tokens)
+                            return
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                queue = self._queues[client_id]
+                queue.remove(ticket)
+                # Move this client to the back so the next client in line goes first
+                self._queues.move_to_end(client_id)
+                if not queue:
+                    del self._queues[client_id]
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold all admissions for `seconds`, e.g. after the server returned 429"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+def backoff_delay(attempt, base_delay, max_delay, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than retry_after"""
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def call_with_retries(send, is_retryable, retry_after_of, max_retries, base_delay, max_delay, on_throttle=None):
+    """Call send() until it succeeds, retrying errors for which is_retryable(e) is true.
+
+    retry_after_of(e) returns the server-requested delay in seconds or None.
+    on_throttle(e, delay), if given, is called before each backoff sleep.
+    """
+    attempt = 0
+    while True:
+        try:
+            return send()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay, retry_after_of(e))
+            if on_throttle is not None:
+                on_throttle(e, delay)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,170 @@
+"""Near-duplicate detection of RFPs across runs.
+
+Agencies re-issue tenders with small amendments. Every uploaded RFP's page
+text is kept in the run store with a MinHash signature of its word 3-grams,
+and an LSH index over those signatures finds earlier runs of (nearly) the
+same document in a few milliseconds. The new run is then seeded with the
+earlier run's memoized stage outputs (see run_store.RunMemo), so only the
+parser chunks, knowledge lookups and response sections affected by the
+amendment are sent to the model again; see agents.run_document_parser and
+agents.draft_sections.
+"""
+import hashlib
+import os
+import threading
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from run_store import RunMemo
+from text_index import LSHIndex, MinHasher, estimated_jaccard, normalize_text, tokenize, word_shingles
+
+# Minimum estimated Jaccard similarity of two RFPs' word 3-grams to treat one as a re-issue of the other
+RFP_SIMILARITY_THRESHOLD = float(os.getenv("RFP_SIMILARITY_THRESHOLD", "0.5"))
+# Most recent runs considered when looking for an earlier version
+RFP_INDEX_MAX_RUNS = int(os.getenv("RFP_INDEX_MAX_RUNS", "5000"))
+
+NUM_PERM = 128
+LSH_BANDS = 32  # 4 rows per band: candidates from a similarity of about 0.4
+
+
+def document_shingles(pages):
+    shingle_set = set()
+    for page in pages:
+        shingle_set |= word_shingles(tokenize(page))
+    return shingle_set
+
+
+def page_digest(page):
+    """Hash of a page's text that ignores case, whitespace and punctuation"""
+    return hashlib.sha1(normalize_text(page).encode("utf-8")).hexdigest()
+
+
+def diff_pages(old_pages, new_pages):
+    """Page-level difference between two versions of an RFP.
+
+    Returns counts of unchanged pages and 1-based page numbers of the
+    changed and added pages (in the new version) and removed pages (in the
+    old one).
+    """
+    matcher = SequenceMatcher(None, [page_digest(page) for page in old_pages], [page_digest(page) for page in new_pages], autojunk=False)
+    diff = {"unchanged": 0, "changed": [], "added": [], "removed": []}
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            diff["unchanged"] += new_end - new_start
+            continue
+        paired = min(old_end - old_start, new_end - new_start)
+        diff["changed"].extend(range(new_start + 1, new_start + paired + 1))
+        diff["added"].extend(range(new_start + paired + 1, new_end + 1))
+        diff["removed"].extend(range(old_start + paired + 1, old_end + 1))
+    return diff
+
+
+class RFPIndex:
+    """LSH index over the MinHash signatures of stored runs' page text"""
+
+    def __init__(self, store, threshold=None):
+        self.store = store
+        self.threshold = RFP_SIMILARITY_THRESHOLD if threshold is None else threshold
+        self._hasher = MinHasher(NUM_PERM)
+        self._index = LSHIndex(NUM_PERM, LSH_BANDS)
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def signature(self, pages):
+        return self._hasher.signature(document_shingles(pages))
+
+    def _sync(self):
+        # Pick up runs added since, including those stored by other processes (batch.py)
+        for run in self.store.recent_runs(limit=RFP_INDEX_MAX_RUNS, with_stage="minhash"):
+            if run["id"] not in self._signatures:
+                signature = np.array(self.store.get(run["id"], "minhash"), dtype=np.uint64)
+                self._signatures[run["id"]] = signature
+                self._index.add(run["id"], signature)
+
+    def add(self, run_id, pages):
+        """Store a run's pages and signature and index it"""
+        signature = self.signature(pages)
+        self.store.put(run_id, "pages", pages)
+        self.store.put(run_id, "minhash", signature.tolist())
+        with self._lock:
+            self._signatures[run_id] = signature
+            self._index.add(run_id, signature)
+
+    def find_similar(self, pages, exclude=(), limit=3):
+        """Earlier runs at or above the similarity threshold, most similar first.
+
+        Only runs whose requirements were extracted are returned, since
+        there is nothing to reuse from the others.
+        """
+        signature = self.signature(pages)
+        with self._lock:
+            self._sync()
+            scored = [
+                (estimated_jaccard(signature, self._signatures[run_id]), run_id)
+                for run_id in self._index.query(signature) if run_id not in exclude
+            ]
+        similar = []
+        for similarity, run_id in sorted(scored, reverse=True):
+            if similarity < self.threshold:
+                break
+            if "requirements" not in self.store.stages(run_id):
+                continue
+            similar.append({"run_id": run_id, "name": self.store.get_run(run_id)["name"], "similarity": similarity})
+            if len(similar) == limit:
+                break
+        return similar
+
+
+def seed_from_previous(store, previous_run_id, run_id, pages, similarity=None):
+    """Start run_id from the memoized stage outputs of an earlier version of the same RFP.
+
+    Records the earlier run and the page diff as the run's "previous_run"
+    stage and returns it.
+    """
+    store.copy_stages(previous_run_id, run_id, prefix=RunMemo.PREFIX)
+    previous = {
+        "run_id": previous_run_id,
+        "name": store.get_run(previous_run_id)["name"],
+        "similarity": similarity,
+        "diff": diff_pages(store.get(previous_run_id, "pages", []), pages),
+    }
+    store.put(run_id, "previous_run", previous)
+    return previous
+
+
+def previous_outputs(store, run_id):
+    """Requirements and section drafts of the run this one was seeded from, or None.
+
+    In the form agents.draft_sections() takes as previous. Only the run's
+    first draft starts from the earlier run: once it has a response draft
+    of its own, later re-runs and redrafts go by its own section memos.
+    """
+    previous = store.get(run_id, "previous_run")
+    if previous is None or "response_draft" in store.stages(run_id):
+        return None
+    previous_run_id = previous["run_id"]
+    requirements = store.get(previous_run_id, "open_requirements") or store.get(previous_run_id, "requirements")
+    if not isinstance(requirements, dict) or "error" in requirements:
+        return None
+    sections = {}
+    for section in requirements.get("Required_Sections_For_The_Response") or []:
+        entry = store.get(previous_run_id, f"{RunMemo.PREFIX}section:{section}")
+        if entry is not None:
+            sections[section] = entry["outputs"]
+    return {"requirements": requirements, "sections": sections}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_rfp_index():
+    """Return the process-wide RFP index over the shared run store"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from run_store import get_store
+                _index = RFPIndex(get_store())
+    return _index
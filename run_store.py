@@ -0,0 +1,170 @@
+"""Persistent store for RFP runs and their stage outputs.
+
+Each run (one uploaded RFP) has an id; every stage output (rfp_text,
+requirements, knowledge, response_draft, review, ...) is stored as a
+zlib-compressed JSON blob keyed by (run id, stage). Sessions keep only the
+run id and load stage outputs when a view needs them, so server memory no
+longer grows with the number of users holding large RFP texts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+from cache import DATA_DIR
+
+# Number of decompressed stage outputs kept in memory across all sessions
+LOADED_STAGES_MAX = int(os.getenv("RFP_RUN_STORE_MEMORY_ITEMS", "64"))
+
+
+class RunStore:
+    def __init__(self, path, memory_items=LOADED_STAGES_MAX):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                pdf_sha256 TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS stages (
+                run_id TEXT NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+                stage TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (run_id, stage)
+            )"""
+        )
+        self._loaded = OrderedDict()
+        self._memory_items = memory_items
+
+    def create_run(self, name=None, pdf_sha256=None):
+        """Register a new run and return its id"""
+        run_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (id, name, pdf_sha256, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (run_id, name, pdf_sha256, now, now)
+            )
+        return run_id
+
+    def put(self, run_id, stage, value):
+        """Store a JSON-serialisable stage output, replacing any previous value"""
+        raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        blob = zlib.compress(raw)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (run_id, stage, data, size, updated) VALUES (?, ?, ?, ?, ?)",
+                (run_id, stage, sqlite3.Binary(blob), len(raw), now)
+            )
+            self._conn.execute("UPDATE runs SET updated = ? WHERE id = ?", (now, run_id))
+            self._loaded.pop((run_id, stage), None)
+
+    def get(self, run_id, stage, default=None):
+        """Load a stage output, or default if the run has no such stage"""
+        key = (run_id, stage)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+            row = self._conn.execute(
+                "SELECT data FROM stages WHERE run_id = ? AND stage = ?", key
+            ).fetchone()
+        if row is None:
+            return default
+        value = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        with self._lock:
+            self._loaded[key] = value
+            while len(self._loaded) > self._memory_items:
+                self._loaded.popitem(last=False)
+        return value
+
+    def copy_stages(self, source_run_id, run_id, prefix=""):
+        """Copy the stages of source_run_id whose names start with prefix into run_id, keeping existing ones"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO stages (run_id, stage, data, size, updated) "
+                "SELECT ?, stage, data, size, ? FROM stages WHERE run_id = ? AND substr(stage, 1, ?) = ?",
+                (run_id, now, source_run_id, len(prefix), prefix)
+            )
+
+    def stages(self, run_id):
+        """Names of the stages stored for a run"""
+        with self._lock:
+            rows = self._conn.execute("SELECT stage FROM stages WHERE run_id = ?", (run_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def get_run(self, run_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, pdf_sha256, created, updated FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "name", "pdf_sha256", "created", "updated"), row))
+
+    def recent_runs(self, limit=10, with_stage=None):
+        """Most recently updated runs, optionally only those that have with_stage"""
+        query = "SELECT id, name, pdf_sha256, created, updated FROM runs"
+        params = []
+        if with_stage is not None:
+            query += " WHERE EXISTS (SELECT 1 FROM stages WHERE run_id = runs.id AND stage = ?)"
+            params.append(with_stage)
+        query += " ORDER BY updated DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(("id", "name", "pdf_sha256", "created", "updated"), row)) for row in rows]
+
+
+class RunMemo:
+    """Fingerprinted stage outputs of one run, in the form Pipeline.run() expects.
+
+    Entries are stored as "memo:<name>" stages, so a re-run of the same run
+    only recomputes the stages (and section drafts) whose inputs changed.
+    """
+
+    PREFIX = "memo:"
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+
+    def get(self, name):
+        entry = self.store.get(self.run_id, self.PREFIX + name)
+        if entry is None:
+            return None
+        return entry["fingerprint"], entry["outputs"]
+
+    def put(self, name, fingerprint, outputs):
+        self.store.put(self.run_id, self.PREFIX + name, {"fingerprint": fingerprint, "outputs": outputs})
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide run store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RunStore(os.path.join(DATA_DIR, "runs.sqlite"))
+    return _store
@@ -0,0 +1,170 @@
+"""Near-duplicate lookup of stored completions by prompt similarity.
+
+The exact response cache (cache.SqliteCache keyed by the payload hash) misses
+as soon as a re-issued or amended RFP changes whitespace, the order of the
+requirement categories or a few words. This cache embeds the prompt text with
+the hashing vectorizer from text_index and serves the stored completion of
+the most similar earlier prompt in the same scope when their cosine
+similarity reaches the threshold.
+
+Vectors are bucketed by random-hyperplane LSH (several tables of a few sign
+bits each), so a lookup only scores the handful of entries that share a
+bucket with the query. Entries live in SQLite with LRU and TTL eviction like
+SqliteCache; the in-memory index is rebuilt from it when the cache is opened.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from text_index import hashed_vector, tokenize
+
+
+class SemanticCache:
+    """Persistent bytes values looked up by text similarity within a scope.
+
+    scope is an opaque string that must match exactly (e.g. a hash of the
+    model, sampling settings and system prompt); text is compared by cosine
+    similarity of hashed unigram and bigram vectors.
+    """
+
+    def __init__(self, path, threshold=0.95, dims=1024, max_entries=2000, ttl=None, tables=8, bits=8, seed=7):
+        self.path = path
+        self.threshold = threshold
+        self.dims = dims
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        rng = np.random.RandomState(seed)
+        self._planes = rng.standard_normal((tables * bits, dims)).astype(np.float32)
+        self._tables = tables
+        self._bit_weights = 1 << np.arange(bits, dtype=np.int64)
+        self._entries = {}  # key -> (scope, vector, bucket keys)
+        self._buckets = {}  # (table, scope, code) -> set of keys
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                dims INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                value BLOB NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        with self._lock:
+            self._evict(time.time())
+            rows = self._conn.execute("SELECT key, scope, dims, vector FROM entries").fetchall()
+            for key, scope, dims, vector in rows:
+                if dims != self.dims:
+                    continue  # written with another vector size; left for eviction
+                self._index(key, scope, np.frombuffer(vector, dtype=np.float32))
+
+    def embed(self, text):
+        return hashed_vector(tokenize(text), dims=self.dims)
+
+    def _bucket_keys(self, scope, vector):
+        signs = (self._planes @ vector > 0).reshape(self._tables, -1)
+        codes = signs @ self._bit_weights
+        return [(table, scope, int(code)) for table, code in enumerate(codes)]
+
+    def _index(self, key, scope, vector):
+        bucket_keys = self._bucket_keys(scope, vector)
+        self._entries[key] = (scope, vector, bucket_keys)
+        for bucket_key in bucket_keys:
+            self._buckets.setdefault(bucket_key, set()).add(key)
+
+    def _unindex(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for bucket_key in entry[2]:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def get(self, scope, text):
+        """Return (value, similarity) of the closest entry at or above the threshold, or None"""
+        vector = self.embed(text)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for bucket_key in self._bucket_keys(scope, vector):
+                candidates |= self._buckets.get(bucket_key, set())
+            best_key, best_similarity = None, self.threshold
+            if candidates:
+                keys = list(candidates)
+                similarities = np.stack([self._entries[key][1] for key in keys]) @ vector
+                index = int(np.argmax(similarities))
+                if similarities[index] >= best_similarity:
+                    best_key, best_similarity = keys[index], float(similarities[index])
+            row = None
+            if best_key is not None:
+                row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (best_key,)).fetchone()
+                if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (best_key,))
+                    self._unindex(best_key)
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, best_key))
+            self.hits += 1
+            return bytes(row[0]), best_similarity
+
+    def set(self, scope, text, value):
+        """Store value for text and evict entries beyond the configured limits"""
+        vector = self.embed(text)
+        if not vector.any():
+            return  # nothing to compare against
+        now = time.time()
+        with self._lock:
+            key = self._conn.execute(
+                "INSERT INTO entries (scope, dims, vector, value, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, self.dims, sqlite3.Binary(vector.tobytes()), sqlite3.Binary(value), now, now)
+            ).lastrowid
+            self._index(key, scope, vector)
+            self._evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._entries.clear()
+            self._buckets.clear()
+
+    def _evict(self, now):
+        doomed = []
+        if self.ttl is not None:
+            doomed.extend(row[0] for row in self._conn.execute("SELECT key FROM entries WHERE created < ?", (now - self.ttl,)))
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - len(doomed)
+        if count > self.max_entries:
+            # Least recently used first
+            expired = set(doomed)
+            for (key,) in self._conn.execute("SELECT key FROM entries ORDER BY accessed ASC"):
+                if count <= self.max_entries:
+                    break
+                if key not in expired:
+                    doomed.append(key)
+                    count -= 1
+        if doomed:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in doomed])
+            for key in doomed:
+                self._unindex(key)
+
+    def stats(self):
+        """Return entry count and hit/miss counters for this process"""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
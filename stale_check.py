@@ -0,0 +1,86 @@
+"""Check that editing a requirement changes the drafted response.
+
+Runs the pipeline against the local stub LLM (stub_server.py) on the sample
+requirements, and on a copy padded past the prompt-cache minimum, then on an
+amended version of each (a new submission deadline and a revised WCAG
+version) with the response cache, the semantic cache and the stage memo all
+enabled, as for an amended RFP in the app. The draft and the review must
+change; exits non-zero and lists the stale outputs if they don't:
+
+    python stale_check.py
+"""
+import copy
+import os
+import sys
+import tempfile
+
+import llm_client
+import stub_server
+from agents import build_rfp_pipeline, get_sample_rfp_requirements
+from run_store import RunMemo, RunStore
+
+
+def edited_requirements(requirements):
+    """Copy of requirements as an amended RFP would change them: a new deadline and a revised standard"""
+    edited = copy.deepcopy(requirements)
+    edited["Deadlines"]["Submission_Deadline"] = "June 29, 2025, 17:00 AEST"
+    standards = edited["Compliance_Needs"]["Standards_Compliance"]
+    edited["Compliance_Needs"]["Standards_Compliance"] = [item.replace("WCAG 2.1", "WCAG 2.2") for item in standards]
+    return edited
+
+
+def padded_requirements(requirements):
+    """Copy of requirements with a shared context long enough to be marked for prompt caching"""
+    padded = copy.deepcopy(requirements)
+    services = requirements["Key_Requirements_And_Deliverables"]["IT_Services"]
+    padded["Key_Requirements_And_Deliverables"]["IT_Services"] = [
+        f"Work package {number}: {item}" for number in range(1, 61) for item in services
+    ]
+    return padded
+
+
+def check_edited_requirements(server, store):
+    """Names of the outputs that an edited requirement left unchanged"""
+    def llm(prompt, **kwargs):
+        return llm_client.create_message("stub", prompt, **kwargs)
+
+    sample = get_sample_rfp_requirements()
+    stale = []
+    for name, requirements in (("sample", sample), ("padded", padded_requirements(sample))):
+        run_id = store.create_run(f"edited-{name}")
+        memo = RunMemo(store, run_id)
+        outputs = []
+        for version in (requirements, edited_requirements(requirements)):
+            requests_before = server.state.requests
+            context, _ = build_rfp_pipeline(llm, memo=memo).run({"rfp_text": "", "requirements": version}, memo=memo)
+            outputs.append(context)
+        if server.state.requests == requests_before:
+            stale.append(f"{name}: no model calls")
+        for key in ("response_draft", "review"):
+            if outputs[0][key] == outputs[1][key]:
+                stale.append(f"{name}: {key}")
+    return stale
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="rfp-stale-") as directory:
+        # Every cache on, in a directory of its own; this process uses no others
+        llm_client.RESPONSE_CACHE_CONFIG.update(enabled=True, path=os.path.join(directory, "llm_responses.sqlite"))
+        llm_client.SEMANTIC_CACHE_CONFIG.update(enabled=True, path=os.path.join(directory, "llm_semantic.sqlite"))
+        llm_client.RATE_LIMIT_CONFIG.update(requests_per_minute=10 ** 9, input_tokens_per_minute=10 ** 12)
+        server, base_url = stub_server.start_in_background(port=0)
+        llm_client.configure(base_url=base_url)
+        try:
+            stale = check_edited_requirements(server, RunStore(os.path.join(directory, "runs.sqlite")))
+        finally:
+            server.shutdown()
+
+    for output in stale:
+        print(f"STALE {output} unchanged after editing the requirements")
+    if not stale:
+        print("OK: editing the requirements changed the draft and the review")
+    return 1 if stale else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
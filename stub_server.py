@@ -0,0 +1,364 @@
+"""Local stand-in for the Anthropic Messages API, for offline load tests and benchmarks.
+
+Serves POST /v1/messages in the same shape as the real API, including SSE
+streams when the request sets "stream": true. Responses come from recorded
+fixtures when one matches the request, otherwise from a deterministic
+responder that knows just enough about the agents' prompts (JSON for the
+Document Parser, one heading per drafted section) for the whole pipeline to
+run. Latency, streaming speed and failures (429, 529, mid-stream errors and
+hung requests) are injected at configurable rates with a fixed seed, so runs
+are reproducible.
+
+Point the app at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8765, or
+llm_client.configure(base_url=...) from scripts.
+
+    python stub_server.py --port 8765 --latency 0.5 --rate-429 0.05
+    python stub_server.py --record https://api.anthropic.com --fixtures fixtures/
+
+Fixtures are JSON files in the fixtures directory holding a recorded
+"response" message and either the exact request "key" (see fixture_key) or a
+"contains" substring matched against the request's system prompt and
+messages. --record forwards requests to a real upstream and saves each reply
+as a keyed fixture.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import hash_payload
+from llm_client import min_cacheable_tokens
+from prompts import count_tokens
+
+# Defaults for every injection setting; rates are probabilities per request
+STUB_CONFIG = {
+    "latency": 0.0,  # seconds before the response starts
+    "jitter": 0.0,  # up to this many extra seconds, uniformly
+    "tokens_per_second": 0.0,  # output streaming speed; 0 sends everything at once
+    "rate_429": 0.0,
+    "rate_529": 0.0,
+    "rate_stream_error": 0.0,  # overloaded_error event halfway through a stream
+    "rate_timeout": 0.0,  # hold the request open for hang seconds without answering
+    "hang": 150.0,  # longer than the client's default read timeout
+    "retry_after": 1.0,  # retry-after header sent with 429s
+    "output_tokens": 300,  # approximate length of generated responses
+    "seed": 0,
+}
+
+_SECTION_PROMPT = re.compile(r'Write the "([^"]+)" section')
+_WORDS = (
+    "our team delivers proven outcomes through a structured methodology with clear governance "
+    "transparent reporting experienced consultants and a strong track record across government "
+    "and enterprise clients ensuring compliance quality and value for money"
+).split()
+
+
+def fixture_key(data):
+    """Key identifying a request regardless of whether it was streamed"""
+    return hash_payload({key: value for key, value in data.items() if key != "stream"})
+
+
+def _request_text(data):
+    return json.dumps([data.get("system"), data.get("messages")], ensure_ascii=False)
+
+
+def _prompt_text(data):
+    content = data["messages"][-1]["content"]
+    if isinstance(content, list):
+        return "\n".join(block.get("text", "") for block in content)
+    return content
+
+
+def load_fixtures(directory):
+    """Return (fixtures by key, substring fixtures in file name order)"""
+    by_key, by_substring = {}, []
+    if directory and os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                fixture = json.load(f)
+            if "key" in fixture:
+                by_key[fixture["key"]] = fixture["response"]
+            elif "contains" in fixture:
+                by_substring.append((fixture["contains"], fixture["response"]))
+    return by_key, by_substring
+
+
+def sample_requirements():
+    from agents import get_sample_rfp_requirements
+
+    return get_sample_rfp_requirements()
+
+
+def generated_text(data, rng, output_tokens):
+    """Deterministic stand-in completion for a request"""
+    system = json.dumps(data.get("system"), ensure_ascii=False)
+    prompt = _prompt_text(data)
+    if "JSON only" in system:
+        return json.dumps(sample_requirements())
+    words = [rng.choice(_WORDS) for _ in range(max(1, min(output_tokens, data.get("max_tokens", output_tokens))))]
+    paragraphs = [" ".join(words[i:i + 60]).capitalize() + "." for i in range(0, len(words), 60)]
+    section = _SECTION_PROMPT.search(prompt)
+    heading = f"## {section.group(1)}" if section else "## Stub response"
+    return heading + "\n\n" + "\n\n".join(paragraphs)
+
+
+class StubState:
+    """Fixtures, settings and simulated prompt-cache contents shared by request handlers"""
+
+    def __init__(self, config=None, fixtures_dir=None, record_upstream=None):
+        self.config = dict(STUB_CONFIG, **(config or {}))
+        self.fixtures_dir = fixtures_dir
+        self.record_upstream = record_upstream
+        self.fixtures, self.substring_fixtures = load_fixtures(fixtures_dir)
+        self.rng = random.Random(self.config["seed"])
+        self.lock = threading.Lock()
+        self.cached_prefixes = set()
+        self.requests = 0
+        self.injected = {"429": 0, "529": 0, "stream_error": 0, "timeout": 0}
+
+    def roll(self, name):
+        """True with probability config["rate_<name>"], counting injected failures"""
+        with self.lock:
+            hit = self.rng.random() < self.config[f"rate_{name}"]
+            if hit:
+                self.injected[name] += 1
+        return hit
+
+    def delay(self):
+        with self.lock:
+            return self.config["latency"] + self.rng.uniform(0, self.config["jitter"])
+
+    def usage(self, data, text):
+        """Usage block that mimics prompt caching of system blocks marked with cache_control.
+
+        Like the API, prefixes shorter than the model's minimum cacheable
+        length are billed as ordinary input.
+        """
+        usage = {"input_tokens": 0, "output_tokens": count_tokens(text),
+                 "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        system = data.get("system")
+        prefix = []
+        if isinstance(system, list):
+            for block in system:
+                prefix.append(block.get("text", ""))
+                if block.get("cache_control"):
+                    key = hash_payload([data.get("model"), prefix])
+                    tokens = count_tokens("".join(prefix))
+                    if tokens < min_cacheable_tokens(data.get("model", "")):
+                        continue
+                    with self.lock:
+                        seen = key in self.cached_prefixes
+                        self.cached_prefixes.add(key)
+                    usage["cache_read_input_tokens" if seen else "cache_creation_input_tokens"] = tokens
+        cached = usage["cache_read_input_tokens"] + usage["cache_creation_input_tokens"]
+        usage["input_tokens"] = max(0, count_tokens(_request_text(data)) - cached)
+        return usage
+
+    def respond(self, data, headers):
+        """Return the message for a request: fixture, recorded upstream reply or generated"""
+        key = fixture_key(data)
+        if key in self.fixtures:
+            return self.fixtures[key]
+        text = _request_text(data)
+        for substring, response in self.substring_fixtures:
+            if substring in text:
+                return response
+        if self.record_upstream:
+            return self.record(key, data, headers)
+
+        rng = random.Random(key + str(self.config["seed"]))
+        body = generated_text(data, rng, self.config["output_tokens"])
+        return {
+            "id": f"msg_stub_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": data.get("model", "stub"),
+            "content": [{"type": "text", "text": body}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": self.usage(data, body),
+        }
+
+    def record(self, key, data, headers):
+        import requests
+
+        response = requests.post(
+            self.record_upstream.rstrip("/") + "/v1/messages",
+            headers={name: headers[name] for name in ("x-api-key", "anthropic-version", "content-type") if name in headers},
+            json=dict(data, stream=False),
+            timeout=300
+        )
+        response.raise_for_status()
+        message = response.json()
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        with open(os.path.join(self.fixtures_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump({"key": key, "request": data, "response": message}, f, ensure_ascii=False, indent=1)
+        with self.lock:
+            self.fixtures[key] = message
+        return message
+
+
+def sse_events(message, chunk_words=8):
+    """The SSE event sequence the Messages API sends for a completed message"""
+    text = "".join(block.get("text", "") for block in message["content"] if block.get("type") == "text")
+    usage = message.get("usage", {})
+    start = dict(message, content=[], stop_reason=None, usage=dict(usage, output_tokens=1))
+    yield "message_start", {"type": "message_start", "message": start}
+    yield "content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    pieces = re.findall(r"\S+\s*|\s+", text)
+    for i in range(0, len(pieces), chunk_words):
+        delta = "".join(pieces[i:i + chunk_words])
+        yield "content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": delta}}
+    yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+    yield "message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": message.get("stop_reason", "end_turn"), "stop_sequence": None},
+        "usage": {"output_tokens": usage.get("output_tokens", 0)},
+    }
+    yield "message_stop", {"type": "message_stop"}
+
+
+def _error_body(kind, message):
+    return {"type": "error", "error": {"type": kind, "message": message}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "rfp-stub/1"
+    state = None  # set on the subclass created by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Counters for load-test reports
+        if self.path == "/stats":
+            with self.state.lock:
+                stats = {"requests": self.state.requests, "injected": dict(self.state.injected)}
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, _error_body("not_found_error", "Not found"))
+
+    def do_POST(self):
+        state = self.state
+        length = int(self.headers.get("content-length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, _error_body("invalid_request_error", "Body is not valid JSON"))
+            return
+        if self.path.rstrip("/") != "/v1/messages":
+            self._send_json(404, _error_body("not_found_error", "Not found"))
+            return
+        with state.lock:
+            state.requests += 1
+
+        time.sleep(state.delay())
+        if state.roll("timeout"):
+            time.sleep(state.config["hang"])
+            self.close_connection = True
+            return
+        if state.roll("429"):
+            self._send_json(429, _error_body("rate_limit_error", "Injected rate limit"),
+                            {"retry-after": str(state.config["retry_after"])})
+            return
+        if state.roll("529"):
+            self._send_json(529, _error_body("overloaded_error", "Injected overload"))
+            return
+
+        try:
+            message = state.respond(data, {name.lower(): value for name, value in self.headers.items()})
+        except Exception as e:
+            self._send_json(502, _error_body("api_error", f"Stub could not produce a response: {e}"))
+            return
+
+        if not data.get("stream"):
+            self._pace(message["usage"].get("output_tokens", 0))
+            self._send_json(200, message)
+            return
+
+        # Streamed replies have no length up front, so the connection closes after the stream
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        events = list(sse_events(message))
+        fail_at = len(events) // 2 if state.roll("stream_error") else None
+        for index, (event, payload) in enumerate(events):
+            if index == fail_at:
+                event, payload = "error", _error_body("overloaded_error", "Injected mid-stream overload")
+            if event == "content_block_delta":
+                self._pace(count_tokens(payload["delta"]["text"]))
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if index == fail_at:
+                return
+
+    def _pace(self, tokens):
+        rate = self.state.config["tokens_per_second"]
+        if rate > 0 and tokens:
+            time.sleep(tokens / rate)
+
+
+def make_server(host="127.0.0.1", port=8765, config=None, fixtures_dir=None, record_upstream=None):
+    """Create (but don't start) a stub server; port 0 picks a free port"""
+    state = StubState(config, fixtures_dir, record_upstream)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def start_in_background(**kwargs):
+    """Start a stub server on a daemon thread; returns (server, base_url)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="rfp-stub", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stub of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="directory of recorded fixtures to replay (and record into)")
+    parser.add_argument("--record", metavar="UPSTREAM", help="forward unmatched requests to this base URL and save them as fixtures")
+    for name, default in STUB_CONFIG.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    config = {name: getattr(args, name) for name in STUB_CONFIG}
+    server = make_server(args.host, args.port, config, args.fixtures, args.record)
+    print(f"Stub Anthropic API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
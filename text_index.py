@@ -0,0 +1,170 @@
+"""Text normalisation and vectorisation shared by the retrieval indexes.
+
+Everything here is local and CPU-only: a word tokenizer with a small English
+stopword list, a hashing vectorizer that maps text to a fixed-size,
+L2-normalised NumPy vector without a vocabulary, so vectors built at
+different times (or in different processes) are always comparable, and
+MinHash signatures with an LSH band index for near-duplicate lookups.
+"""
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+(?:[.'-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being between both but by can could did do does
+each for from had has have having how i if in into is it its may more most must no not of on or other our
+over shall should so such than that the their them then there these they this those through to under up
+upon very was we were what when where which while who will with within would you your
+""".split())
+
+
+def tokenize(text, stopwords=True):
+    """Lowercase word tokens; digits, dotted and hyphenated words stay whole (iso-27001, 2.1)"""
+    tokens = _WORD.findall((text or "").lower())
+    if stopwords:
+        tokens = [token for token in tokens if token not in STOPWORDS]
+    return tokens
+
+
+def normalize_text(text):
+    """Canonical form of text for comparisons: lowercase tokens joined by single spaces"""
+    return " ".join(tokenize(text, stopwords=False))
+
+
+# Numbers, versions, dates, times and clause ids (2.1, 9001:2015, 24/7, 17:00, R000123) and month names
+_LITERAL = re.compile(
+    r"\w*\d[\w.:/-]*|\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b",
+    re.IGNORECASE
+)
+# Upper-case codes such as conformance levels and acronyms (AA, AAA, ISO, GDPR)
+_CODE = re.compile(r"\b[A-Z]{2,}\b")
+
+
+def literals(text):
+    """Lowercase tokens two texts must share exactly to say the same thing.
+
+    Numbers, versions, dates, times, identifiers and upper-case codes, in
+    order of appearance within each kind.
+    """
+    text = text or ""
+    found = [token.rstrip(".:/-") for token in _LITERAL.findall(text)] + _CODE.findall(text)
+    return [token.lower() for token in found]
+
+
+def _bucket(feature, dims):
+    # crc32 is stable across processes, unlike hash()
+    value = zlib.crc32(feature.encode("utf-8"))
+    return value % dims, 1.0 if value & 0x80000000 else -1.0
+
+
+def hashed_vector(tokens, dims=512, bigrams=True):
+    """Signed feature-hashing vector of unigram (and bigram) counts, log-scaled and L2-normalised"""
+    vector = np.zeros(dims, dtype=np.float32)
+    features = list(tokens)
+    if bigrams:
+        features.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for feature in features:
+        index, sign = _bucket(feature, dims)
+        vector[index] += sign
+    np.copysign(np.log1p(np.abs(vector)), vector, out=vector)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def term_hashes(tokens):
+    """Stable 64-bit hashes of tokens, for vocabulary-free on-disk term lookup"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") for token in tokens],
+        dtype=np.uint64
+    )
+
+
+def shingles(text, size=4):
+    """Character n-grams of the normalised text, robust to punctuation and small wording changes"""
+    text = " ".join(tokenize(text))
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def word_shingles(tokens, size=3):
+    """Word n-grams of a token list, for comparing long texts such as pages"""
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets; the fraction of equal slots estimates Jaccard similarity"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.RandomState(seed)
+        # Coefficients below 2**32 keep a * hash + b inside uint64 for 32-bit shingle hashes
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(item.encode("utf-8")) for item in shingle_set), dtype=np.uint64, count=len(shingle_set))
+        return ((np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME).min(axis=0)
+
+
+def estimated_jaccard(signature_a, signature_b):
+    return float(np.mean(signature_a == signature_b))
+
+
+class LSHIndex:
+    """Banded locality-sensitive hash index over MinHash signatures.
+
+    Keys whose signatures agree on all rows of at least one band are
+    returned as candidates; with b bands of r rows, pairs above a Jaccard
+    similarity of about (1/b) ** (1/r) are found with high probability.
+    """
+
+    def __init__(self, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = defaultdict(set)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, signature):
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].add(key)
+
+    def remove(self, key, signature):
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def query(self, signature):
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self._buckets.get(band_key, set())
+        return candidates